@@ -6,7 +6,8 @@ from fastapi import APIRouter, Depends
 from api.private.car import car_router
 from api.private.parking_location import parking_router
 from api.private.parking_session import session_router
-from app.core.jwt import FastJWT
+from app.core.jwt import fast_jwt
+from models.models import User
 
 private_router = APIRouter(prefix="/private")
 
@@ -22,14 +23,14 @@ private_router.include_router(session_router)
 
 
 @private_router.post("/telegram/request-code")
-async def get_connection_code(user=Depends(FastJWT().login_required)):
+async def get_connection_code(user=Depends(fast_jwt.login_required)):
     # Generate 6 random bytes and encode to Base32 (approx 10 chars)
     random_bytes = os.urandom(6)
     code = base64.b32encode(random_bytes).decode("utf-8").replace("=", "")
 
     full_code = f"CONNECT_{code}"
 
-    user.connection_code = full_code
-    await user.save()
+    # $set only: the cached user may be stale, save() would write all of it back
+    await user.set({User.connection_code: full_code})
 
     return {"code": full_code}
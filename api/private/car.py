@@ -1,25 +1,34 @@
 import os
-from io import BytesIO
 
 from beanie import PydanticObjectId
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from PIL import Image
+from pymongo.errors import DuplicateKeyError
 
 from app.core.config import config
-from app.core.jwt import FastJWT
+from app.core.jwt import fast_jwt
+from app.utils.idempotency import IdempotentRoute, idempotent
+from app.utils.images import ImageProcessingError, image_processor, sniff_image
+from app.utils.loader import Loaders, get_loaders
 from models.models import Car
 
 UPLOAD_DIR = "static/cars"
 
-car_router = APIRouter(prefix="/car")
+car_router = APIRouter(prefix="/car", route_class=IdempotentRoute)
 
 
 @car_router.post("")
+@idempotent
 async def create_car(
     license_plate: str = Form(...),
     photo: UploadFile = File(...),
-    user=Depends(FastJWT().login_required),
+    user=Depends(fast_jwt.login_required),
 ):
+    # Header only, so an unusable photo is rejected before any writes
+    try:
+        sniff_image(photo.file)
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
     existing_car = await Car.find_one(
         Car.user_id == user.id,
         Car.license_plate == license_plate,
@@ -30,18 +39,24 @@ async def create_car(
         )
 
     car = Car(user_id=user.id, license_plate=license_plate)
-    await car.insert()
+    try:
+        await car.insert()
+    except DuplicateKeyError:
+        # A concurrent request added the same plate after the check above
+        raise HTTPException(
+            status_code=400, detail="This plate is already in your garage"
+        )
 
     # Filename format: user_id-car_id.jpg
     filename = f"{user.id}-{car.id}.jpg"
     file_path = os.path.join(UPLOAD_DIR, filename)
 
     try:
-        content = await photo.read()
-        with Image.open(BytesIO(content)) as img:
-            # Convert to RGB (required for PNG to JPG conversion)
-            rgb_img = img.convert("RGB")
-            rgb_img.save(file_path, "JPEG", quality=20)
+        # The spooled upload goes to Pillow as is, never read into memory whole
+        await image_processor.save_as_jpeg(photo.file, file_path)
+    except ImageProcessingError as e:
+        await car.delete()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception:
         # If image processing fails, you might want to delete the DB record
         await car.delete()
@@ -57,7 +72,7 @@ async def create_car(
 
 
 @car_router.get("")
-async def get_cars(user=Depends(FastJWT().login_required)):
+async def get_cars(user=Depends(fast_jwt.login_required)):
     cars = Car.find(Car.user_id == user.id)
     return {
         "cars": [
@@ -73,9 +88,13 @@ async def get_cars(user=Depends(FastJWT().login_required)):
 
 
 @car_router.get("/{car_id}")
-async def get_car(car_id: PydanticObjectId, user=Depends(FastJWT().login_required)):
-    car = await Car.find_one(Car.id == car_id, Car.user_id == user.id)
-    if not car:
+async def get_car(
+    car_id: PydanticObjectId,
+    user=Depends(fast_jwt.login_required),
+    loaders: Loaders = Depends(get_loaders),
+):
+    car = await loaders.car.load(car_id)
+    if not car or car.user_id != user.id:
         raise HTTPException(status_code=404, detail="Car not found")
 
     return {
@@ -1,10 +1,20 @@
+import asyncio
+import math
 from typing import Optional
 
 from beanie import PydanticObjectId
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 
-from app.core.jwt import FastJWT
+from app.core.config import config
+from app.core.jwt import fast_jwt
+from app.utils.geo import (
+    geohash_cell_radius,
+    geohash_center,
+    geohash_encode,
+    haversine_meters,
+)
+from app.utils.proximity_cache import proximity_cache
 from models.models import (
     FeeClassification,
     ParkingLocation,
@@ -13,6 +23,8 @@ from models.models import (
 
 parking_router = APIRouter(prefix="/parking")
 
+PROXIMITY_RESULTS = 10
+
 
 class ParkingLocationCreateRequest(BaseModel):
     location_name: str
@@ -24,42 +36,50 @@ class ParkingLocationCreateRequest(BaseModel):
     is_public: bool = False
 
 
+async def get_saved_location_ids(user_id: PydanticObjectId) -> list[PydanticObjectId]:
+    collection = UserParkingLocation.get_pymongo_collection()
+    cursor = collection.find({"user_id": user_id}, {"_id": 0, "parking_location_id": 1})
+    return [membership["parking_location_id"] async for membership in cursor]
+
+
 async def get_proximity_pipeline(
-    user_id: PydanticObjectId, lat: float, lng: float, search_type: str
+    user_id: Optional[PydanticObjectId],
+    lat: float,
+    lng: float,
+    search_type: str,
+    limit: int = PROXIMITY_RESULTS,
+    location_ids: Optional[list[PydanticObjectId]] = None,
+    max_distance: Optional[float] = None,
 ):
     """
-    search_type: "saved" (user's memberships) or "public" (other public records)
+    search_type: "saved" (the user's memberships, passed as location_ids)
+    or "public" (other public records). With no user_id, "public" returns
+    every public record, owners included. max_distance defaults to
+    PROXIMITY_MAX_DISTANCE.
     """
-    pipeline = []
-
-    # 1. GeoNear must be FIRST. Note: lng, lat order for GeoJSON.
-    pipeline.append(
-        {
-            "$geoNear": {
-                "near": {"type": "Point", "coordinates": [lng, lat]},
-                "distanceField": "distance_meters",
-                "spherical": True,
-                "query": {"is_active": True},
-            }
-        }
-    )
-
+    # 1. All filtering happens inside $geoNear, so the 2dsphere scan only
+    # visits candidate records instead of every active location.
+    query = {"is_active": True}
     if search_type == "saved":
-        pipeline.append(
-            {
-                "$lookup": {
-                    "from": "user_parking_location",
-                    "localField": "_id",
-                    "foreignField": "parking_location_id",
-                    "as": "membership",
-                }
-            }
-        )
-        pipeline.append({"$match": {"membership.user_id": user_id}})
+        query["_id"] = {"$in": location_ids or []}
     else:
-        pipeline.append(
-            {"$match": {"is_public": True, "owner_user_id": {"$ne": user_id}}}
-        )
+        query["is_public"] = True
+        if user_id:
+            query["owner_user_id"] = {"$ne": user_id}
+
+    # GeoNear must be FIRST. Note: lng, lat order for GeoJSON.
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [lng, lat]},
+        "distanceField": "distance_meters",
+        "spherical": True,
+        "query": query,
+    }
+    max_distance = max_distance or config.PROXIMITY_MAX_DISTANCE
+    if max_distance:
+        geo_near["maxDistance"] = max_distance
+
+    # 2. Limit right after $geoNear so the server stops scanning early
+    pipeline = [{"$geoNear": geo_near}, {"$limit": limit}]
 
     # 3. Project results - converting ObjectIds to strings here saves us from loop-fixing later
     pipeline.append(
@@ -74,6 +94,7 @@ async def get_proximity_pipeline(
                 "max_stay": "$max_stay",
                 "is_public": "$is_public",
                 "is_owner": {"$eq": ["$owner_user_id", user_id]},
+                "owner_id": {"$toString": "$owner_user_id"},
             }
         }
     )
@@ -81,10 +102,75 @@ async def get_proximity_pipeline(
     return pipeline
 
 
+def candidates_radius(center_lat: float, center_lng: float) -> Optional[float]:
+    """
+    How far from a cell center candidates are fetched: PROXIMITY_MAX_DISTANCE
+    plus the cell's own radius, so the search disk of any point in the cell
+    is covered.
+    """
+    if not config.PROXIMITY_MAX_DISTANCE:
+        return None
+    precision = config.PROXIMITY_CACHE_PRECISION
+    return config.PROXIMITY_MAX_DISTANCE + geohash_cell_radius(
+        center_lat, center_lng, precision
+    )
+
+
+async def get_public_candidates(lat: float, lng: float) -> list[dict]:
+    pipeline = await get_proximity_pipeline(
+        None,
+        lat,
+        lng,
+        "public",
+        limit=config.PROXIMITY_CACHE_CANDIDATES,
+        max_distance=candidates_radius(lat, lng),
+    )
+    collection = ParkingLocation.get_pymongo_collection()
+    return await collection.aggregate(pipeline).to_list(length=None)
+
+
+def rank_public_candidates(
+    candidates: list[dict], user_id: PydanticObjectId, lat: float, lng: float
+) -> Optional[list[dict]]:
+    """
+    The nearest public records to (lat, lng) among a cell's candidates,
+    excluding the user's own. Records left out of the candidates are at
+    least `covered` meters from the cell center, so only results closer
+    than `covered` minus the user's distance to the center are certain;
+    None when that doesn't hold for the whole answer.
+    """
+    center_lat, center_lng = geohash_center(
+        geohash_encode(lat, lng, config.PROXIMITY_CACHE_PRECISION)
+    )
+    if len(candidates) >= config.PROXIMITY_CACHE_CANDIDATES:
+        # Sorted by distance from the center, rounded to the meter
+        covered = candidates[-1]["distance"] - 1
+    else:
+        covered = candidates_radius(center_lat, center_lng) or math.inf
+    certain = covered - haversine_meters(lat, lng, center_lat, center_lng)
+
+    owner_id = str(user_id)
+    max_distance = config.PROXIMITY_MAX_DISTANCE or math.inf
+    results = []
+    for candidate in candidates:
+        if candidate["owner_id"] == owner_id:
+            continue
+        distance = haversine_meters(lat, lng, candidate["lat"], candidate["lng"])
+        if distance <= max_distance:
+            results.append({**candidate, "distance": round(distance), "is_owner": False})
+
+    results.sort(key=lambda result: result["distance"])
+    results = results[:PROXIMITY_RESULTS]
+
+    # A full answer only needs its farthest result covered, a short one the whole radius
+    needed = results[-1]["distance"] if len(results) == PROXIMITY_RESULTS else max_distance
+    return results if needed <= certain else None
+
+
 @parking_router.post("")
 async def create_parking_location(
     payload: ParkingLocationCreateRequest,
-    user=Depends(FastJWT().login_required),
+    user=Depends(fast_jwt.login_required),
 ):
     parking_location = ParkingLocation(
         owner_user_id=user.id,
@@ -114,26 +200,41 @@ async def create_parking_location(
 
 @parking_router.get("/proximity")
 async def get_nearby_parking(
-    lat: float, lng: float, user=Depends(FastJWT().login_required)
+    lat: float, lng: float, user=Depends(fast_jwt.login_required)
 ):
+    async def get_saved():
+        location_ids = await get_saved_location_ids(user.id)
+        if not location_ids:
+            return []
 
-    collection = ParkingLocation.get_pymongo_collection()
+        pipeline = await get_proximity_pipeline(
+            user.id, lat, lng, "saved", location_ids=location_ids
+        )
+        collection = ParkingLocation.get_pymongo_collection()
+        return await collection.aggregate(pipeline).to_list(length=None)
+
+    async def get_public():
+        candidates = await proximity_cache.get_candidates(
+            lat, lng, get_public_candidates
+        )
+        results = rank_public_candidates(candidates, user.id, lat, lng)
+        if results is not None:
+            return results
 
-    saved_pipeline = await get_proximity_pipeline(user.id, lat, lng, "saved")
-    saved_results = await collection.aggregate(saved_pipeline).to_list(length=10)
+        # Dense cell or the user's own records crowd the candidates: ask directly
+        pipeline = await get_proximity_pipeline(user.id, lat, lng, "public")
+        collection = ParkingLocation.get_pymongo_collection()
+        return await collection.aggregate(pipeline).to_list(length=None)
 
-    public_pipeline = await get_proximity_pipeline(user.id, lat, lng, "public")
-    public_results = await collection.aggregate(public_pipeline).to_list(length=10)
+    saved_results, public_results = await asyncio.gather(get_saved(), get_public())
 
     return {"saved": saved_results, "public": public_results}
 
 
-@parking_router.get("")
-async def get_parking_locations(user=Depends(FastJWT().login_required)):
-    collection = UserParkingLocation.get_pymongo_collection()
-
-    pipeline = [
-        {"$match": {"user_id": user.id}},
+def saved_locations_pipeline(user_id: PydanticObjectId) -> list[dict]:
+    """The user's saved parking locations, joined from their memberships."""
+    return [
+        {"$match": {"user_id": user_id}},
         {
             "$lookup": {
                 "from": "parking_location",
@@ -153,11 +254,17 @@ async def get_parking_locations(user=Depends(FastJWT().login_required)):
                 "lng": "$details.longitude",
                 "max_stay": "$details.max_stay",
                 "owner_id": {"$toString": "$details.owner_user_id"},
-                "is_owner": {"$eq": ["$details.owner_user_id", user.id]},
+                "is_owner": {"$eq": ["$details.owner_user_id", user_id]},
                 "is_public": "$details.is_public",
             }
         },
     ]
 
+
+@parking_router.get("")
+async def get_parking_locations(user=Depends(fast_jwt.login_required)):
+    collection = UserParkingLocation.get_pymongo_collection()
+    pipeline = saved_locations_pipeline(user.id)
+
     results = await collection.aggregate(pipeline).to_list(length=None)
     return results
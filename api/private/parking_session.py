@@ -1,51 +1,68 @@
 import asyncio
+import base64
+import json
 import os
 from datetime import datetime, time, timedelta, timezone
-from io import BytesIO
 from typing import Optional
 
 from beanie import PydanticObjectId
+from bson import ObjectId
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     File,
     Form,
     HTTPException,
+    Query,
+    Response,
     UploadFile,
 )
-from PIL import Image
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from app.core.config import config
-from app.core.jwt import FastJWT
-from app.utils.telegram import send_telegram_msg
-from models.models import Car, ParkingLocation, ParkingSession, ParkingSessionStatus
+from app.core.jwt import fast_jwt
+from app.utils.idempotency import IdempotentRoute, idempotent
+from app.utils.images import ImageProcessingError, image_processor, sniff_image
+from app.utils.loader import Loaders, get_loaders
+from app.utils.session_lifecycle import start_session, transition_session
+from models.models import Car, ParkingSession, ParkingSessionStatus, SessionEventType
 
-session_router = APIRouter(prefix="/session", tags=["Parking Sessions"])
+session_router = APIRouter(
+    prefix="/session", tags=["Parking Sessions"], route_class=IdempotentRoute
+)
 
 SESSION_UPLOAD_DIR = "static/sessions"
 
 
 @session_router.post("")
+@idempotent
 async def create_parking_session(
-    background_tasks: BackgroundTasks,
     car_id: str = Form(...),
     parking_location_id: Optional[str] = Form(None),
     manual_max_stay_mins: Optional[int] = Form(None),
     lat: float = Form(...),
     lng: float = Form(...),
     photo: UploadFile = File(...),
-    user=Depends(FastJWT().login_required),
+    user=Depends(fast_jwt.login_required),
+    loaders: Loaders = Depends(get_loaders),
 ):
-    car = await Car.find_one(Car.id == PydanticObjectId(car_id), Car.user_id == user.id)
-    if not car:
+    # Header only, so an unusable photo is rejected before any writes
+    try:
+        sniff_image(photo.file)
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    car, location = await asyncio.gather(
+        loaders.car.load(car_id), loaders.location.load(parking_location_id)
+    )
+    if not car or car.user_id != user.id:
         raise HTTPException(status_code=404, detail="Car not found in your garage")
 
     start_time = datetime.now(timezone.utc)
     calculated_end_time = None
 
     if parking_location_id:
-        location = await ParkingLocation.get(PydanticObjectId(parking_location_id))
         if not location:
             raise HTTPException(status_code=404, detail="Parking location not found")
 
@@ -59,7 +76,9 @@ async def create_parking_session(
             )
         calculated_end_time = start_time + timedelta(minutes=manual_max_stay_mins)
 
+    # The id is known up front so the photo can be stored before anything is written
     session = ParkingSession(
+        id=PydanticObjectId(),
         user_id=user.id,
         car_id=car.id,
         car_location={"type": "Point", "coordinates": [lng, lat]},
@@ -70,42 +89,24 @@ async def create_parking_session(
         end_time=calculated_end_time,
         status=ParkingSessionStatus.ACTIVE,
     )
-    await session.insert()
-
-    if user.telegram_chat_id:
-        from app.utils.reminders import schedule_reminders
-
-        asyncio.create_task(
-            schedule_reminders(user.telegram_chat_id, session.end_time, str(session.id))
-        )
-        parking_location = None
-        if parking_location_id:
-            parking_location = await ParkingLocation.get(parking_location_id)
-
-        duration = 0
-        location = await ParkingLocation.get(PydanticObjectId(parking_location_id))
-        if location:
-            duration = location.max_stay if location.max_stay else 1440
-        else:
-            duration = manual_max_stay_mins
-
-        await send_telegram_msg(
-            user.telegram_chat_id,
-            f"Your parking session at '{parking_location.location_name if parking_location else 'Unknown'}' for {car.license_plate} that lasts {duration} minutes has started.",
-        )
-
     filename = f"{user.id}-{session.id}.jpg"
     file_path = os.path.join(SESSION_UPLOAD_DIR, filename)
 
     try:
-        content = await photo.read()
-        with Image.open(BytesIO(content)) as img:
-            rgb_img = img.convert("RGB")
-            rgb_img.save(file_path, "JPEG", quality=20)
+        # The spooled upload goes to Pillow as is, never read into memory whole
+        await image_processor.save_as_jpeg(photo.file, file_path)
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception:
-        await session.delete()
         raise HTTPException(status_code=400, detail="Failed to process proof photo")
 
+    # Reminders and the Telegram message are sent by the event dispatcher
+    try:
+        await start_session(session)
+    except Exception:
+        os.remove(file_path)
+        raise
+
     return {
         "session_id": str(session.id),
         "car_plate": car.license_plate,
@@ -115,13 +116,124 @@ async def create_parking_session(
     }
 
 
+# Fields returned by the session list: every ParkingSession field, as
+# before the list was projected, plus car and location
+SESSION_LIST_FIELDS = [
+    "_id",
+    "user_id",
+    "parking_location_id",
+    "car_id",
+    "start_time",
+    "car_location",
+    "end_time",
+    "actual_end_time",
+    "status",
+    "created_at",
+]
+SESSION_LIST_SORT = [("start_time", -1), ("_id", -1)]
+
+
+def encode_session_cursor(session: dict) -> str:
+    raw = f"{session['start_time'].isoformat()}|{session['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_session_cursor(cursor: str) -> dict:
+    """Returns the filter selecting sessions after the cursor in SESSION_LIST_SORT order."""
+    try:
+        start_time, session_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        start_time = datetime.fromisoformat(start_time)
+        session_id = PydanticObjectId(session_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return {
+        "$or": [
+            {"start_time": {"$lt": start_time}},
+            {"start_time": start_time, "_id": {"$lt": session_id}},
+        ]
+    }
+
+
+def session_read_pipeline(
+    match: dict,
+    fields: Optional[list[str]] = None,
+    limit: Optional[int] = None,
+) -> list[dict]:
+    """
+    Sessions matching `match` (newest first) joined with their car and
+    parking location, so a session and its details cost a single query.
+    """
+    pipeline = [{"$match": match}, {"$sort": dict(SESSION_LIST_SORT)}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    if fields:
+        pipeline.append({"$project": {field: 1 for field in fields}})
+
+    pipeline += [
+        {
+            "$lookup": {
+                "from": "car",
+                "localField": "car_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"license_plate": 1}}],
+                "as": "car",
+            }
+        },
+        {
+            "$lookup": {
+                "from": "parking_location",
+                "localField": "parking_location_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"location_name": 1}}],
+                "as": "location",
+            }
+        },
+        {"$set": {"car": {"$first": "$car"}, "location": {"$first": "$location"}}},
+    ]
+    return pipeline
+
+
+def serialize_session(session: dict) -> dict:
+    car = session.get("car")
+    location = session.get("location")
+
+    return jsonable_encoder(
+        {
+            **{field: session.get(field) for field in SESSION_LIST_FIELDS},
+            "car": {
+                "license_plate": car["license_plate"] if car else "Unknown",
+                "id": car["_id"] if car else None,
+            },
+            "location": {
+                "name": location["location_name"] if location else "Manual Location",
+                "id": location["_id"] if location else None,
+            },
+        },
+        custom_encoder={ObjectId: str},
+    )
+
+
 @session_router.get("")
 async def get_sessions(
+    response: Response,
     status: Optional[str] = None,
     car_reg: Optional[str] = None,
     date: Optional[datetime] = None,
-    user=Depends(FastJWT().login_required),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=config.SESSION_PAGE_SIZE_MAX),
+    stream: bool = False,
+    user=Depends(fast_jwt.login_required),
 ):
+    """
+    Newest sessions first. Without `limit` or `cursor` the whole history is
+    returned, as before pagination existed. Otherwise `limit` (default
+    SESSION_PAGE_SIZE) are returned at a time, and when more sessions exist
+    the cursor for the next page is in the X-Next-Cursor header. With
+    stream=true, the whole history is streamed as NDJSON instead.
+    """
     query_filter = {"user_id": user.id}
 
     if car_reg:
@@ -132,66 +244,124 @@ async def get_sessions(
             return []
         query_filter["car_id"] = car.id
 
-    query = ParkingSession.find(query_filter)
-
     if status:
-        query = query.find(ParkingSession.status == status)
+        query_filter["status"] = status
     if date:
         start_of_day = datetime.combine(date, time.min)
         end_of_day = datetime.combine(date, time.max)
-        query = query.find(
-            ParkingSession.start_time >= start_of_day,
-            ParkingSession.start_time <= end_of_day,
-        )
+        query_filter["start_time"] = {"$gte": start_of_day, "$lte": end_of_day}
+    if cursor:
+        query_filter = {"$and": [query_filter, decode_session_cursor(cursor)]}
 
-    return await query.to_list()
+    collection = ParkingSession.get_pymongo_collection()
+
+    if stream:
+        pipeline = session_read_pipeline(query_filter, SESSION_LIST_FIELDS)
+
+        async def stream_sessions():
+            async for session in collection.aggregate(pipeline):
+                yield json.dumps(serialize_session(session)) + "\n"
+
+        return StreamingResponse(stream_sessions(), media_type="application/x-ndjson")
+
+    if limit is None and cursor is None:
+        pipeline = session_read_pipeline(query_filter, SESSION_LIST_FIELDS)
+        sessions = await collection.aggregate(pipeline).to_list(length=None)
+        return [serialize_session(session) for session in sessions]
+
+    limit = limit or config.SESSION_PAGE_SIZE
+    pipeline = session_read_pipeline(query_filter, SESSION_LIST_FIELDS, limit + 1)
+    sessions = await collection.aggregate(pipeline).to_list(length=None)
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        response.headers["X-Next-Cursor"] = encode_session_cursor(sessions[-1])
+
+    return [serialize_session(session) for session in sessions]
 
 
 @session_router.get("/{session_id}")
-async def get_session(session_id: str, user=Depends(FastJWT().login_required)):
-    session = await ParkingSession.get(PydanticObjectId(session_id))
-    if not session or session.user_id != user.id:
+async def get_session(session_id: str, user=Depends(fast_jwt.login_required)):
+    pipeline = session_read_pipeline(
+        {"_id": PydanticObjectId(session_id), "user_id": user.id}
+    )
+    sessions = await ParkingSession.get_pymongo_collection().aggregate(pipeline).to_list(
+        length=1
+    )
+    if not sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    car = await Car.get(session.car_id)
-    location = (
-        await ParkingLocation.get(session.parking_location_id)
-        if session.parking_location_id
-        else None
-    )
+    session = sessions[0]
+    car = session.get("car")
+    location = session.get("location")
+    car_location = session.get("car_location")
 
-    filename = f"{user.id}-{session.id}.jpg"
+    filename = f"{user.id}-{session['_id']}.jpg"
     photo_url = f"{config.API_BASE_URL}/api/static/sessions/{filename}"
 
     return {
-        "id": str(session.id),
-        "status": session.status,
-        "start_time": session.start_time,
-        "end_time": session.end_time,
-        "actual_end_time": session.actual_end_time,
+        "id": str(session["_id"]),
+        "status": session["status"],
+        "start_time": session["start_time"],
+        "end_time": session["end_time"],
+        "actual_end_time": session.get("actual_end_time"),
         "photo_url": photo_url,
         "car": {
-            "license_plate": car.license_plate if car else "Unknown",
-            "id": str(car.id) if car else None,
+            "license_plate": car["license_plate"] if car else "Unknown",
+            "id": str(car["_id"]) if car else None,
         },
         "location": {
-            "name": location.location_name if location else "Manual Location",
-            "id": str(location.id) if location else None,
-            "coords": session.car_location["coordinates"] if session.car_location else None,
+            "name": location["location_name"] if location else "Manual Location",
+            "id": str(location["_id"]) if location else None,
+            "coords": car_location["coordinates"] if car_location else None,
         },
-        "manual_max_stay_mins": (session.end_time - session.start_time).total_seconds() / 60
+        "manual_max_stay_mins": (
+            session["end_time"] - session["start_time"]
+        ).total_seconds()
+        / 60
         if not location
         else None,
     }
 
 
 @session_router.post("/{session_id}/complete")
-async def complete_session(session_id: str, user=Depends(FastJWT().login_required)):
-    session = await ParkingSession.get(PydanticObjectId(session_id))
+async def complete_session(
+    session_id: str,
+    user=Depends(fast_jwt.login_required),
+    loaders: Loaders = Depends(get_loaders),
+):
+    session = await loaders.session.load(session_id)
     if not session or session.user_id != user.id:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    session.status = ParkingSessionStatus.COMPLETED
-    session.actual_end_time = datetime.now(timezone.utc)
-    await session.save()
+    ended = await transition_session(
+        session.id,
+        user.id,
+        ParkingSessionStatus.COMPLETED,
+        SessionEventType.COMPLETED,
+        ended_at=datetime.now(timezone.utc),
+    )
+    if not ended:
+        return {"status": session.status.value}
     return {"status": "completed"}
+
+
+@session_router.post("/{session_id}/cancel")
+async def cancel_session(
+    session_id: str,
+    user=Depends(fast_jwt.login_required),
+    loaders: Loaders = Depends(get_loaders),
+):
+    session = await loaders.session.load(session_id)
+    if not session or session.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    ended = await transition_session(
+        session.id,
+        user.id,
+        ParkingSessionStatus.CANCELLED,
+        SessionEventType.CANCELLED,
+        ended_at=datetime.now(timezone.utc),
+    )
+    if not ended:
+        return {"status": session.status.value}
+    return {"status": "cancelled"}
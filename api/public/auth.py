@@ -2,25 +2,17 @@ import datetime
 from uuid import uuid4
 
 from beanie import PydanticObjectId
-from fastapi import (
-    APIRouter,
-    BackgroundTasks,
-    Depends,
-    HTTPException,
-    Request,
-    Response,
-)
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Request, Response
 from pydantic import BaseModel, EmailStr, Field
+from pymongo.errors import DuplicateKeyError
 
 from app.core.config import config
-from app.core.email import send_email
-from app.core.jwt import FastJWT
-from app.core.password_utils import (
-    generate_password,
-    get_password_hash,
-    verify_password,
-)
+from app.core.jwt import fast_jwt
+from app.core.password_utils import generate_password, password_hasher
+from app.utils.email_outbox import email_outbox
 from app.utils.flags import signup_enabled
+from app.utils.rate_limit import auth_limiter
+from app.utils.revocation import revocation
 from models.models import OTPActivationModel, PasswordResetToken, User
 
 
@@ -40,91 +32,44 @@ class UserOut(BaseModel):
 auth_router = APIRouter(prefix="/auth")
 
 
-async def send_verification_email(email: str, activation_token: str):
-    # TODO: Use proper email template
-    await send_email(
-        email,
-        "Activation of Parkomat account",
-        f"""
-Please verify your email address
+async def send_verification_email(email: str, activation_link: str) -> bool:
+    return await email_outbox.enqueue(email, "verification", link=activation_link)
 
-Click the link below to verify your email address
-{activation_token}
 
+async def send_password_reset_email(email: str, reset_link: str) -> bool:
+    return await email_outbox.enqueue(email, "password_reset", link=reset_link)
 
-If you didn't sign up for Parkomat, you can ignore this email.
-
-Kind Regards,
-Ihor Savenko | Parkomat Security System
-        """,
-    )
-
-
-async def send_password_reset_email(email: str, reset_link: str):
-    await send_email(
-        email,
-        "Reset your Parkomat password",
-        f"""
-We received a request to reset your password.
-
-Click the link below to set a new password:
-{reset_link}
-
-If you didn't request this, you can ignore this email.
-
-Kind Regards,
-Ihor Savenko | Parkomat Security System
-        """,
-    )
 
+async def send_signin_alert_email(email: str) -> bool:
+    return await email_outbox.enqueue(email, "signin_alert")
 
-async def send_signin_alert_email(email: str):
-    await send_email(
-        email,
-        "New sign-in to your Parkomat account",
-        f"""
-We detected a new sign-in to your Parkomat account.
 
-If this was you, no action is needed.
-If this wasn't you, please reset your password.
-
-Kind Regards,
-Ihor Savenko | Parkomat Security System
-        """,
-    )
-
-
-async def send_password_reset_confirmation(email: str):
-    await send_email(
-        email,
-        "Your Parkomat password was reset",
-        f"""
-Your Parkomat password has been reset successfully.
-
-If you didn't do this, please reset your password again immediately.
-
-Kind Regards,
-Ihor Savenko | Parkomat Security System
-        """,
-    )
+async def send_password_reset_confirmation(email: str) -> bool:
+    return await email_outbox.enqueue(email, "password_reset_confirmation")
 
 
 @auth_router.post("/signup", response_model=UserOut)
 async def signup_event(
     payload: AuthSchema,
-    background_tasks: BackgroundTasks,
+    request: Request,
     _=Depends(signup_enabled),
 ) -> UserOut:
+    await auth_limiter.check(request, "signup")
+
     if await User.find_one({"email": payload.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(payload.password)
+    hashed_password = await password_hasher.hash(payload.password)
 
     user: User = User(
         email=payload.email,
         password=hashed_password,
     )
-    user: User = await user.insert()
+    try:
+        user: User = await user.insert()
+    except DuplicateKeyError:
+        # A concurrent signup with the same email got there first
+        raise HTTPException(status_code=400, detail="Email already registered")
 
     otp_code = generate_password(9)
 
@@ -136,7 +81,7 @@ async def signup_event(
 
     await otp_activation.insert()
 
-    activation_token = await FastJWT().encode_otp(
+    activation_token = await fast_jwt.encode_otp(
         data={
             "otp_id": str(otp_activation.id),
             "otp_code": otp_code,
@@ -147,14 +92,20 @@ async def signup_event(
         f"{config.API_BASE_URL}/api/public/auth/activate/{activation_token}"
     )
 
-    background_tasks.add_task(send_verification_email, payload.email, activation_link)
+    if not await send_verification_email(payload.email, activation_link):
+        # Without the email the account could never be activated, nor signed up again
+        await otp_activation.delete()
+        await user.delete()
+        raise HTTPException(
+            status_code=503, detail="Could not send the activation email, please try again"
+        )
 
     return UserOut(id=user.id, email=user.email)
 
 
 @auth_router.get("/activate/{otp_activation_token}")
 async def activate_otp(otp_activation_token: str):
-    decoded = await FastJWT().decode_otp(otp_activation_token)
+    decoded = await fast_jwt.decode_otp(otp_activation_token)
     if not decoded:
         raise HTTPException(status_code=400, detail="Invalid OTP token")
 
@@ -182,32 +133,18 @@ async def activate_otp(otp_activation_token: str):
         await otp_record.delete()
         raise HTTPException(status_code=400, detail="Invalid OTP token")
 
-    user.email_verified = True
-
-    await user.save()
+    await user.set({User.email_verified: True})
 
     await otp_record.delete()
 
     return {"message": "Account activated successfully"}
 
 
-@auth_router.post("/signin")
-async def signin_event(
-    payload: AuthSchema,
-    response: Response,
-    background_tasks: BackgroundTasks,
-):
-    user = await User.find_one({"email": payload.email})
-    if not user or not verify_password(payload.password, user.password):
-        raise HTTPException(status_code=401, detail="Bad email or password")
-
-    if not user.email_verified:
-        raise HTTPException(status_code=401, detail="Email not verified")
-
-    jwt_token = await FastJWT().encode_access(
+async def _set_access_cookie(response: Response, user: User):
+    jwt_token = await fast_jwt.encode_access(
         data={
             "id": str(user.id),
-            "email": payload.email,
+            "email": user.email,
         }
     )
 
@@ -223,8 +160,35 @@ async def signin_event(
         path="/",
     )
 
+
+@auth_router.post("/signin")
+async def signin_event(
+    payload: AuthSchema,
+    request: Request,
+    response: Response,
+):
+    await auth_limiter.check(request, "signin", payload.email)
+
+    user = await User.find_one({"email": payload.email})
+    if not user:
+        raise HTTPException(status_code=401, detail="Bad email or password")
+
+    valid, new_hash = await password_hasher.verify(payload.password, user.password)
+    if not valid:
+        await auth_limiter.record_failure("signin", payload.email)
+        raise HTTPException(status_code=401, detail="Bad email or password")
+
+    if new_hash:
+        # Stored with outdated Argon2 parameters, upgrade while we have the password
+        await user.set({User.password: new_hash})
+
+    if not user.email_verified:
+        raise HTTPException(status_code=401, detail="Email not verified")
+
+    await _set_access_cookie(response, user)
+
     if user.notification_settings and user.notification_settings.email_on_signin:
-        background_tasks.add_task(send_signin_alert_email, user.email)
+        await send_signin_alert_email(user.email)
 
     return {"ok": True}
 
@@ -245,8 +209,10 @@ class PasswordChangePayload(BaseModel):
 @auth_router.post("/password-reset/request")
 async def request_password_reset(
     payload: PasswordResetRequest,
-    background_tasks: BackgroundTasks,
+    request: Request,
 ):
+    await auth_limiter.check(request, "password-reset", payload.email, count_email=True)
+
     user = await User.find_one({"email": payload.email})
     if not user:
         return {"ok": True}
@@ -261,7 +227,9 @@ async def request_password_reset(
 
     base_url = (config.FRONTEND_URL or config.API_BASE_URL).rstrip("/")
     reset_link = f"{base_url}/reset-password/{token}"
-    background_tasks.add_task(send_password_reset_email, user.email, reset_link)
+    # Same answer when the email could not be queued: it must not reveal the
+    # account exists, and asking again simply makes a new link
+    await send_password_reset_email(user.email, reset_link)
     return {"ok": True}
 
 
@@ -269,8 +237,10 @@ async def request_password_reset(
 async def confirm_password_reset(
     token: str,
     payload: PasswordResetConfirm,
-    background_tasks: BackgroundTasks,
+    request: Request,
 ):
+    await auth_limiter.check(request, "password-reset-confirm")
+
     reset_entry = await PasswordResetToken.find_one({"token": token})
     if not reset_entry:
         raise HTTPException(status_code=400, detail="Reset link is invalid or expired")
@@ -283,8 +253,8 @@ async def confirm_password_reset(
     if not user:
         raise HTTPException(status_code=400, detail="Reset link is invalid or expired")
 
-    user.password = get_password_hash(payload.password)
-    await user.save()
+    await user.set({User.password: await password_hasher.hash(payload.password)})
+    await revocation.revoke_user_tokens(str(user.id))
 
     reset_entry.used_at = datetime.datetime.utcnow()
     await reset_entry.save()
@@ -293,7 +263,7 @@ async def confirm_password_reset(
         user.notification_settings
         and user.notification_settings.email_on_password_reset
     ):
-        background_tasks.add_task(send_password_reset_confirmation, user.email)
+        await send_password_reset_confirmation(user.email)
 
     return {"ok": True}
 
@@ -301,27 +271,46 @@ async def confirm_password_reset(
 @auth_router.post("/password/change")
 async def change_password(
     payload: PasswordChangePayload,
-    user: User = Depends(FastJWT().login_required),
+    response: Response,
+    current_user: User = Depends(fast_jwt.login_required),
 ):
-    if not verify_password(payload.current_password, user.password):
+    # The authenticated user comes from the cache: check against the stored hash
+    user = await User.get(current_user.id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    valid, _ = await password_hasher.verify(payload.current_password, user.password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Current password is incorrect")
 
-    user.password = get_password_hash(payload.new_password)
-    await user.save()
+    await user.set({User.password: await password_hasher.hash(payload.new_password)})
+
+    # Signs out every other session, this one gets a fresh token
+    await revocation.revoke_user_tokens(str(user.id))
+    await _set_access_cookie(response, user)
     return {"ok": True}
 
 
 @auth_router.get("/verify")
-async def verify_event(request: Request):
-    token: dict = await FastJWT().decode(request.headers["Authorization"])
-    user = await User.get(token["id"])
-    if not user:
-        raise HTTPException(401, "Unauthorized")
+async def verify_event(user: User = Depends(fast_jwt.login_required)):
     return {"status": "valid"}
 
 
 @auth_router.post("/logout")
-async def logout_event(response: Response):
+async def logout_event(
+    request: Request,
+    response: Response,
+    access_token: str | None = Cookie(default=None),
+):
+    token = fast_jwt.get_token(request, access_token)
+    if token:
+        try:
+            payload = await fast_jwt.decode_access(token)
+        except HTTPException:
+            payload = {}
+        if payload.get("jti"):
+            await revocation.revoke_token(payload["jti"], payload["exp"])
+
     is_prod = config.ENV == "production"
 
     response.delete_cookie(
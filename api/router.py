@@ -3,11 +3,11 @@ from fastapi import APIRouter, Depends
 from api.private import private_router
 from api.public import public_router
 from api.static import static_router
-from app.core.jwt import FastJWT
+from app.core.jwt import fast_jwt
 
 router = APIRouter(prefix="/api")
 
 
-router.include_router(private_router, dependencies=[Depends(FastJWT().login_required)])
+router.include_router(private_router, dependencies=[Depends(fast_jwt.login_required)])
 router.include_router(public_router)
 router.include_router(static_router)
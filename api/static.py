@@ -1,34 +1,77 @@
+import asyncio
 import os
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 
+from app.utils.cache import TTLCache
+
 static_router = APIRouter(prefix="/static", tags=["static"])
 
+# Photo names ({user_id}-{id}.jpg) are never reused, so clients may keep them forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# file path -> os.stat_result. Misses are not cached: a photo may be
+# requested before its upload finished writing it.
+stat_cache = TTLCache(maxsize=50_000, ttl=300)
+
+
+async def stat_photo(file_path: str) -> os.stat_result | None:
+    stat_result = stat_cache.get(file_path)
+    if stat_result is not None:
+        return stat_result
+
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
+        return None
+
+    stat_cache.set(file_path, stat_result)
+    return stat_result
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+async def serve_photo(request: Request, directory: str, filename: str) -> Response:
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    file_path = os.path.join(directory, filename)
+    stat_result = await stat_photo(file_path)
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # With a stat_result FileResponse skips its own stat() and handles Range/If-Range
+    return FileResponse(file_path, headers=headers, stat_result=stat_result)
+
 
 @static_router.get("/cars/{filename}")
-async def get_car_image(filename: str):
+async def get_car_image(filename: str, request: Request):
     """
     Serves car images.
     Publicly accessible via UUID-based filenames.
     """
-    file_path = os.path.join("static/cars", filename)
-
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Image not found")
-
-    return FileResponse(file_path)
+    return await serve_photo(request, "static/cars", filename)
 
 
 @static_router.get("/sessions/{filename}")
-async def get_session_image(filename: str):
+async def get_session_image(filename: str, request: Request):
     """
     Serves session images.
     Publicly accessible via UUID-based filenames.
     """
-    file_path = os.path.join("static/sessions", filename)
-
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Image not found")
-
-    return FileResponse(file_path)
+    return await serve_photo(request, "static/sessions", filename)
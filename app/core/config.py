@@ -13,8 +13,29 @@ class Config(BaseSettings):
 
     DATABASE_NAME: str
     DATABASE_URL: str
+    # MongoDB connection pool, None keeps the driver default
+    MONGO_MAX_POOL_SIZE: Optional[int] = None
+    MONGO_MIN_POOL_SIZE: Optional[int] = None
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: Optional[int] = None
+    # e.g. "zstd,snappy,zlib"; zstd and snappy need pymongo[zstd] / pymongo[snappy]
+    MONGO_COMPRESSORS: Optional[str] = None
+    # Commands slower than this are logged with their filter shape, None disables it
+    MONGO_SLOW_QUERY_MS: Optional[int] = 100
+    # Drop indexes the models don't declare (e.g. ones made by hand) on startup
+    MONGO_DROP_UNDECLARED_INDEXES: bool = False
+    # Multi-document transactions; None detects replica set / mongos on startup
+    MONGO_TRANSACTIONS: Optional[bool] = None
 
     TELEGRAM_BOT_TOKEN: str
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    TELEGRAM_WORKERS: int = 8
+    # Telegram allows ~30 messages/s per bot and ~1 message/s per chat
+    TELEGRAM_GLOBAL_RATE: float = 30.0
+    TELEGRAM_CHAT_RATE: float = 1.0
+    TELEGRAM_MAX_RETRIES: int = 3
+    # Messages waiting for a worker; send() fails fast past this
+    TELEGRAM_MAX_QUEUE: int = 10_000
 
     API_BASE_URL: str
     FRONTEND_URL: Optional[str] = None
@@ -22,16 +43,95 @@ class Config(BaseSettings):
     REDIS_HOST: Optional[str] = "redis"
     REDIS_PORT: Optional[int] = 6379
 
+    # Reminder scheduler (due reminders live in a Redis sorted set)
+    REMINDER_POLL_INTERVAL: float = 1.0
+    REMINDER_BATCH_SIZE: int = 100
+    REMINDER_LEASE_SECONDS: int = 120
+    RECOVERY_BATCH_SIZE: int = 500
+    RECOVERY_CONCURRENCY: int = 20
+
+    # Photo uploads are converted to JPEG in a thread pool
+    IMAGE_WORKERS: int = 2
+    IMAGE_MAX_QUEUE: int = 32
+    IMAGE_MAX_PIXELS: int = 50_000_000
+    IMAGE_MAX_DIMENSION: int = 2048
+    IMAGE_JPEG_QUALITY: int = 20
+    # Pillow decoders uploads may use (JPEG also opens camera MPO files)
+    IMAGE_FORMATS: List[str] = ["JPEG", "PNG", "WEBP"]
+    # Request bodies are capped while they stream in (413 past the limit);
+    # leaves room for full-resolution phone photos of ~20 MB
+    UPLOAD_MAX_BYTES: int = 25 * 1024 * 1024
+
+    # Radius of GET /parking/proximity, unbounded when None
+    PROXIMITY_MAX_DISTANCE: Optional[int] = 50_000
+
+    # Idempotency-Key on photo uploads: responses are kept for IDEMPOTENCY_TTL,
+    # duplicates wait up to IDEMPOTENCY_WAIT_TIMEOUT for the first request
+    IDEMPOTENCY_TTL: int = 86400
+    IDEMPOTENCY_LOCK_TTL: int = 120
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 10.0
+    IDEMPOTENCY_POLL_INTERVAL: float = 0.05
+
+    # GET /session page size, once a client asks for pages (limit or cursor)
+    SESSION_PAGE_SIZE: int = 50
+    SESSION_PAGE_SIZE_MAX: int = 200
+
+    # Public parking proximity cache, bucketed by geohash cell (6 = ~1.2 x 0.6 km).
+    # Cells keep more candidates than a response needs, so owners' own records
+    # and points off the cell center still find their 10 nearest in them.
+    PROXIMITY_CACHE_PRECISION: int = 6
+    PROXIMITY_CACHE_CANDIDATES: int = 200
+    PROXIMITY_CACHE_TTL: int = 300
+
+    # Authenticated user cache (in-process LRU + Redis)
+    USER_CACHE_TTL: int = 30
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_REDIS: bool = True
+    USER_CACHE_REDIS_TTL: int = 120
+
+    # Password hashing runs in a thread pool. Argon2 costs default to
+    # passlib's; changing them rehashes each user's password on next login.
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    ARGON2_TIME_COST: Optional[int] = None
+    ARGON2_MEMORY_COST: Optional[int] = None
+    ARGON2_PARALLELISM: Optional[int] = None
+
     SENTRY_DSN: Optional[str] = None
     SENTRY_TRACES_SAMPLE_RATE: float = 0.0
     SENTRY_ENVIRONMENT: Optional[str] = None
 
+    # Bearer token for /metrics, which is disabled while unset
     METRICS_TOKEN: Optional[str] = None
+    # How often each worker refreshes its queue depth gauges; with several
+    # uvicorn workers set PROMETHEUS_MULTIPROC_DIR (see the Dockerfile)
+    METRICS_COLLECT_INTERVAL: int = 10
     FLAGSMITH_TOKEN: Optional[str] = None
+    FLAGS_REFRESH_INTERVAL: int = 30
+    FLAGS_REFRESH_JITTER: float = 0.2
+    FLAGS_IDENTITY_CACHE_TTL: int = 60
+    FLAGS_IDENTITY_CACHE_SIZE: int = 10000
 
     JWT_SECRET_KEY: str
+    JWT_ACCESS_EXPIRE_DAYS: int = 30
+    # Verified access token claims kept in-process, bounded by the token's exp
+    JWT_CACHE_SIZE: int = 10000
+    JWT_CACHE_TTL: int = 3600
     PASSWORDS_SALT_SECRET_KEY: str
 
+    # Auth attempts allowed per window (seconds) per client IP; per email, failed
+    # signins and password reset requests
+    AUTH_RATE_LIMIT_IP: int = 20
+    AUTH_RATE_LIMIT_EMAIL: int = 5
+    # Reverse proxies (IPs or CIDRs) whose X-Forwarded-For names the client
+    TRUSTED_PROXIES: List[str] = []
+    AUTH_RATE_LIMIT_WINDOW: int = 300
+
+    # Revoked tokens are mirrored in an in-process Bloom filter
+    REVOCATION_BLOOM_CAPACITY: int = 100_000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.01
+    REVOCATION_RELOAD_INTERVAL: int = 60
+
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: Optional[int] = None
     SMTP_USER: Optional[str] = None
@@ -39,6 +139,23 @@ class Config(BaseSettings):
     SMTP_SENDER: Optional[str] = None
     START_TLS: bool = True
     USE_TLS: bool = False
+    SMTP_POOL_SIZE: int = 2
+    # Idle connections are checked with NOOP before reuse
+    SMTP_KEEPALIVE: int = 60
+
+    # Session event outbox (Mongo collection drained by a dispatcher)
+    SESSION_EVENT_POLL_INTERVAL: float = 1.0
+    SESSION_EVENT_BATCH_SIZE: int = 100
+    SESSION_EVENT_LEASE_SECONDS: int = 120
+    SESSION_EVENT_MAX_ATTEMPTS: int = 8
+    SESSION_EVENT_RETRY_DELAY: int = 10
+
+    # Email outbox (Redis sorted set drained by a worker)
+    EMAIL_POLL_INTERVAL: float = 1.0
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_LEASE_SECONDS: int = 120
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_DELAY: int = 30
 
     model_config = SettingsConfigDict(
         case_sensitive=True,
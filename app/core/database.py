@@ -1,8 +1,181 @@
+import json
+from contextlib import asynccontextmanager
+
 import motor.motor_asyncio
+from pymongo import monitoring
 
 from app.core.config import config
+from app.utils.metrics import MONGO_COMMAND_SECONDS, MONGO_POOL_WAIT_SECONDS
+
+# Where each command keeps the part worth logging when it is slow
+FILTER_FIELDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def redact(value):
+    """Keeps field names and operators, replaces every value with '?'."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if any(isinstance(item, dict) for item in value):
+            return [redact(item) for item in value]
+        return ["?"] if value else []
+    return "?"
+
+
+def filter_shape(command_name: str, command: dict):
+    if command_name in FILTER_FIELDS:
+        shape = {"filter": redact(command.get(FILTER_FIELDS[command_name], {}))}
+        if "sort" in command:
+            shape["sort"] = list(command["sort"])
+        return shape
+    if command_name == "update":
+        return {"filter": [redact(u.get("q", {})) for u in command.get("updates", [])]}
+    if command_name == "delete":
+        return {"filter": [redact(d.get("q", {})) for d in command.get("deletes", [])]}
+    return None
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Times every command per collection and logs the ones slower than
+    MONGO_SLOW_QUERY_MS with their filter shape. Runs in motor's threads.
+    """
+
+    def __init__(self):
+        self.commands: dict[tuple, tuple] = {}
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return event.connection_id, event.request_id
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+        # The command is only inspected if it turns out to be slow
+        self.commands[self._key(event)] = (
+            collection if isinstance(collection, str) else "",
+            event.command,
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self.record(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self.record(event, "error")
+
+    def record(self, event, outcome: str):
+        collection, command = self.commands.pop(self._key(event), ("", {}))
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMAND_SECONDS.labels(event.command_name, collection, outcome).observe(
+            seconds
+        )
+
+        if config.MONGO_SLOW_QUERY_MS is not None and (
+            seconds * 1000 >= config.MONGO_SLOW_QUERY_MS
+        ):
+            shape = filter_shape(event.command_name, command)
+            print(
+                f"🐢 Slow Mongo {event.command_name} on "
+                f"{event.database_name}.{collection} ({outcome}): "
+                f"{seconds * 1000:.0f}ms"
+                + (f" {json.dumps(shape, default=str)}" if shape else "")
+            )
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Records how long requests wait to check a connection out of the pool."""
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent):
+        MONGO_POOL_WAIT_SECONDS.labels("ok").observe(event.duration)
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ):
+        MONGO_POOL_WAIT_SECONDS.labels(event.reason).observe(event.duration)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": config.MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "compressors": config.MONGO_COMPRESSORS,
+    }
+    # Unset options keep the driver's (or the connection string's) defaults
+    return {key: value for key, value in options.items() if value is not None}
+
 
 client = motor.motor_asyncio.AsyncIOMotorClient(
-    config.DATABASE_URL, uuidRepresentation="standard"
+    config.DATABASE_URL,
+    uuidRepresentation="standard",
+    event_listeners=[CommandMetrics(), PoolMetrics()],
+    **client_options(),
 )
 db = client[config.DATABASE_NAME]
+
+# Resolved on startup by init_transactions()
+transactions_enabled = False
+
+
+async def init_transactions():
+    """Transactions need a replica set or mongos; MONGO_TRANSACTIONS overrides the check."""
+    global transactions_enabled
+    if config.MONGO_TRANSACTIONS is not None:
+        transactions_enabled = config.MONGO_TRANSACTIONS
+        return
+
+    try:
+        hello = await client.admin.command("hello")
+        transactions_enabled = "setName" in hello or hello.get("msg") == "isdbgrid"
+    except Exception as e:
+        print(f"Could not check MongoDB topology, transactions disabled: {e}")
+        transactions_enabled = False
+    print(f"MongoDB transactions {'enabled' if transactions_enabled else 'disabled'}")
+
+
+@asynccontextmanager
+async def transaction():
+    """
+    Yields a session inside a transaction, or None on a standalone mongod,
+    where the writes made with it simply apply one after the other.
+    """
+    if not transactions_enabled:
+        yield None
+        return
+
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            yield session
@@ -1,18 +1,88 @@
+import asyncio
+import time
+from dataclasses import dataclass
 from email.message import EmailMessage
+from string import Template
 from typing import Optional
 
 import aiosmtplib
 
 from app.core.config import config
 
+SIGNATURE = """
+Kind Regards,
+Ihor Savenko | Parkomat Security System
+"""
 
-async def send_email(
-    to: str,
-    subject: str,
-    body: str,
-    sender: Optional[str] = None,
-):
-    if not all(
+
+@dataclass(frozen=True)
+class EmailTemplate:
+    subject: str
+    body: Template
+
+    def render(self, **fields) -> tuple[str, str]:
+        return self.subject, self.body.substitute(fields)
+
+
+# Compiled once at import; the outbox stores the template name and its fields
+TEMPLATES = {
+    "verification": EmailTemplate(
+        "Activation of Parkomat account",
+        Template(
+            """
+Please verify your email address
+
+Click the link below to verify your email address
+$link
+
+
+If you didn't sign up for Parkomat, you can ignore this email.
+"""
+            + SIGNATURE
+        ),
+    ),
+    "password_reset": EmailTemplate(
+        "Reset your Parkomat password",
+        Template(
+            """
+We received a request to reset your password.
+
+Click the link below to set a new password:
+$link
+
+If you didn't request this, you can ignore this email.
+"""
+            + SIGNATURE
+        ),
+    ),
+    "signin_alert": EmailTemplate(
+        "New sign-in to your Parkomat account",
+        Template(
+            """
+We detected a new sign-in to your Parkomat account.
+
+If this was you, no action is needed.
+If this wasn't you, please reset your password.
+"""
+            + SIGNATURE
+        ),
+    ),
+    "password_reset_confirmation": EmailTemplate(
+        "Your Parkomat password was reset",
+        Template(
+            """
+Your Parkomat password has been reset successfully.
+
+If you didn't do this, please reset your password again immediately.
+"""
+            + SIGNATURE
+        ),
+    ),
+}
+
+
+def smtp_configured() -> bool:
+    return all(
         [
             config.SMTP_HOST,
             config.SMTP_PORT,
@@ -20,7 +90,97 @@ async def send_email(
             config.SMTP_PASSWORD,
             config.SMTP_SENDER,
         ]
-    ):
+    )
+
+
+class SMTPPool:
+    """
+    Keeps SMTP_POOL_SIZE authenticated connections open and reuses them.
+    Connections idle for longer than SMTP_KEEPALIVE are checked with NOOP
+    and reconnected if the server dropped them.
+    """
+
+    def __init__(self):
+        self.idle: asyncio.Queue | None = None
+        self.last_used: dict[int, float] = {}
+        self.stats = {"sent": 0, "connects": 0, "reconnects": 0}
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        if config.ENV == "production":
+            return aiosmtplib.SMTP(
+                hostname=config.SMTP_HOST,
+                port=config.SMTP_PORT,
+                username=config.SMTP_USER,
+                password=config.SMTP_PASSWORD,
+                start_tls=True if config.START_TLS and config.SMTP_PORT == 587 else False,
+                use_tls=True if config.USE_TLS and config.SMTP_PORT == 465 else False,
+                timeout=10,
+            )
+        return aiosmtplib.SMTP(hostname=config.SMTP_HOST, port=config.SMTP_PORT, timeout=10)
+
+    def start(self):
+        if self.idle is None:
+            self.idle = asyncio.Queue()
+            for _ in range(config.SMTP_POOL_SIZE):
+                self.idle.put_nowait(self._new_client())
+
+    async def close(self):
+        if self.idle is None:
+            return
+        while not self.idle.empty():
+            client = self.idle.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except Exception:
+                    client.close()
+        self.idle = None
+
+    async def _ready(self, client: aiosmtplib.SMTP):
+        if client.is_connected and (
+            time.monotonic() - self.last_used.get(id(client), 0) > config.SMTP_KEEPALIVE
+        ):
+            try:
+                await client.noop()
+            except aiosmtplib.SMTPException:
+                client.close()
+                self.stats["reconnects"] += 1
+
+        if not client.is_connected:
+            await client.connect()
+            self.stats["connects"] += 1
+
+    async def send(self, message: EmailMessage):
+        self.start()
+        client = await self.idle.get()
+        try:
+            await self._ready(client)
+            try:
+                await client.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # Dropped between the check and the send, one fresh attempt
+                self.stats["reconnects"] += 1
+                await client.connect()
+                await client.send_message(message)
+            self.last_used[id(client)] = time.monotonic()
+            self.stats["sent"] += 1
+        except Exception:
+            client.close()
+            raise
+        finally:
+            self.idle.put_nowait(client)
+
+
+smtp_pool = SMTPPool()
+
+
+async def send_email(
+    to: str,
+    subject: str,
+    body: str,
+    sender: Optional[str] = None,
+):
+    if not smtp_configured():
         print("SMTP is not fully configured, skipping email sending.")
         return
 
@@ -30,21 +190,9 @@ async def send_email(
     message["Subject"] = subject
     message.set_content(body)
 
-    if config.ENV == "production":
-        await aiosmtplib.send(
-            message,
-            hostname=config.SMTP_HOST,
-            port=config.SMTP_PORT,
-            username=config.SMTP_USER,
-            password=config.SMTP_PASSWORD,
-            start_tls=True if config.START_TLS and config.SMTP_PORT == 587 else False,
-            use_tls=True if config.USE_TLS and config.SMTP_PORT == 465 else False,
-            timeout=10,
-        )
-    else:
-        await aiosmtplib.send(
-            message,
-            hostname=config.SMTP_HOST,
-            port=config.SMTP_PORT,
-            timeout=10,
-        )
+    await smtp_pool.send(message)
+
+
+async def send_template(to: str, template: str, fields: dict):
+    subject, body = TEMPLATES[template].render(**fields)
+    await send_email(to, subject, body)
@@ -0,0 +1,182 @@
+from beanie import Document
+from beanie.odm.fields import IndexModelField
+from pymongo import IndexModel
+
+# Documents pointing at another collection's _id, repointed when duplicates are merged
+REFERENCES = {
+    "user": [
+        ("car", "user_id"),
+        ("parking_location", "owner_user_id"),
+        ("user_parking_location", "user_id"),
+        ("parking_session", "user_id"),
+        ("session_event", "user_id"),
+        ("otp_activation", "user_id"),
+        ("password_reset_token", "user_id"),
+    ],
+    "car": [("parking_session", "car_id")],
+}
+# Which duplicate survives a merge (the first in this order); oldest otherwise
+KEEP_ORDER = {"user": {"email_verified": -1, "_id": 1}}
+# Options that tell two indexes on the same key apart; the server adds others
+# (e.g. 2dsphereIndexVersion) that declarations never spell out
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def index_options(index: IndexModelField) -> dict:
+    options = {}
+    for name in COMPARED_OPTIONS:
+        value = index.index.document.get(name)
+        if value is not None and value is not False:
+            options[name] = value
+    return options
+
+
+def find_same_index(
+    existing: list[IndexModelField], index: IndexModelField
+) -> tuple[IndexModelField | None, bool]:
+    """The existing index on the same key, and whether its options match."""
+    current = IndexModelField.find_index_with_the_same_fields(existing, index)
+    return current, bool(current) and index_options(current) == index_options(index)
+
+
+async def find_duplicates(collection, keys: list[str]) -> list[list]:
+    """Ids of the documents sharing each value of `keys`, the survivor first."""
+    pipeline = [
+        {"$sort": KEEP_ORDER.get(collection.name, {"_id": 1})},
+        {
+            "$group": {
+                "_id": {key.replace(".", "_"): f"${key}" for key in keys},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }
+        },
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    groups = collection.aggregate(pipeline, allowDiskUse=True)
+    return [group["ids"] async for group in groups]
+
+
+async def merge_duplicates(collection, keys: list[str]) -> int:
+    """
+    Leaves one document per value of `keys`: references to the others
+    (see REFERENCES) are repointed to the survivor, then they are copied to
+    `<collection>_merged` and deleted. Every merge is printed for the record.
+    """
+    backup = collection.database[f"{collection.name}_merged"]
+    merged = 0
+    for ids in await find_duplicates(collection, keys):
+        keep, duplicates = ids[0], ids[1:]
+        for name, field in REFERENCES.get(collection.name, []):
+            await collection.database[name].update_many(
+                {field: {"$in": duplicates}}, {"$set": {field: keep}}
+            )
+        removed = await collection.find({"_id": {"$in": duplicates}}).to_list(length=None)
+        await backup.insert_many([{**doc, "merged_into": keep} for doc in removed])
+        await collection.delete_many({"_id": {"$in": duplicates}})
+        print(f"Merged {collection.name} {', '.join(map(str, duplicates))} into {keep}")
+        merged += len(duplicates)
+    return merged
+
+
+def declared_indexes(model: type[Document]) -> list[IndexModelField]:
+    """Settings.indexes of a model, readable before init_beanie ran."""
+    return [
+        IndexModelField(index if isinstance(index, IndexModel) else IndexModel(index))
+        for index in getattr(model.Settings, "indexes", [])
+    ]
+
+
+async def find_index_conflicts(
+    database, document_models: list[type[Document]]
+) -> list[dict]:
+    """
+    Declared indexes init_beanie could not build as they are: an existing
+    index on the same key with other options (a plain index that became
+    unique or TTL), or duplicates in the way of a new unique index.
+    Read-only; scripts/migrate_indexes.py resolves them.
+    """
+    conflicts = []
+    for model in document_models:
+        collection = database[model.Settings.name]
+        existing = IndexModelField.from_pymongo_index_information(
+            await collection.index_information()
+        )
+        for index in declared_indexes(model):
+            current, matches = find_same_index(existing, index)
+            if matches:
+                continue
+
+            duplicates = []
+            unique = index_options(index).get("unique", False)
+            if unique and not (current and index_options(current).get("unique")):
+                keys = list(index.index.document["key"])
+                duplicates = await find_duplicates(collection, keys)
+
+            if current or duplicates:
+                conflicts.append(
+                    {
+                        "collection": collection,
+                        "index": index,
+                        "current": current,
+                        "duplicates": duplicates,
+                    }
+                )
+    return conflicts
+
+
+async def report_index_conflicts(database, document_models: list[type[Document]]) -> bool:
+    """Prints what keeps the declared indexes from being built; True if anything does."""
+    conflicts = await find_index_conflicts(database, document_models)
+    for conflict in conflicts:
+        name = f"{conflict['collection'].name}.{conflict['index'].name}"
+        if conflict["current"]:
+            print(f"⚠️ Index {name} exists with other options")
+        if conflict["duplicates"]:
+            extra = sum(len(ids) - 1 for ids in conflict["duplicates"])
+            print(f"⚠️ {extra} duplicate documents block the unique index {name}")
+    if conflicts:
+        print("⚠️ Indexes were not built, run: python -m scripts.migrate_indexes --apply")
+    return bool(conflicts)
+
+
+async def resolve_index_conflicts(database, document_models: list[type[Document]]):
+    """
+    Merges the duplicates and drops the indexes found by find_index_conflicts,
+    so init_beanie can build the declared ones. Only for scripts/migrate_indexes.py.
+    """
+    for conflict in await find_index_conflicts(database, document_models):
+        collection, index = conflict["collection"], conflict["index"]
+        current = conflict["current"]
+        if conflict["duplicates"]:
+            keys = list(index.index.document["key"])
+            merged = await merge_duplicates(collection, keys)
+            print(f"🧹 Merged {merged} duplicate {collection.name} documents for {index.name}")
+        if current:
+            print(f"🔧 Dropping index {collection.name}.{current.name} to rebuild it")
+            await collection.drop_index(current.name)
+
+
+async def verify_indexes(document_models: list[type[Document]]):
+    """
+    Reports indexes declared in the models' Settings that are missing from
+    MongoDB, and existing indexes that were never used since mongod started.
+    """
+    for model in document_models:
+        collection = model.get_pymongo_collection()
+
+        try:
+            existing = IndexModelField.from_pymongo_index_information(
+                await collection.index_information()
+            )
+            for index in model.get_settings().indexes:
+                if not find_same_index(existing, index)[1]:
+                    print(f"⚠️ Missing index {collection.name}.{index.name}")
+
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                    print(
+                        f"ℹ️ Unused index {collection.name}.{stats['name']} "
+                        f"(no queries since {stats['accesses']['since']:%Y-%m-%d %H:%M})"
+                    )
+        except Exception as e:
+            print(f"Index verification failed for {collection.name}: {e}")
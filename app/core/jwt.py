@@ -1,4 +1,7 @@
 import datetime
+import hashlib
+import time
+from uuid import uuid4
 
 import jwt
 from beanie import PydanticObjectId
@@ -6,6 +9,27 @@ from fastapi import Cookie, HTTPException, Request
 from models.models import User
 
 from app.core.config import config
+from app.utils.cache import TTLCache
+from app.utils.revocation import revocation
+from app.utils.user_cache import user_cache
+
+
+async def get_cached_user(user_id: str) -> User | None:
+    """
+    Snapshot of the user, for reads only: never save() it, since that
+    replaces the whole document. Writes use targeted $set updates or load
+    the user fresh. The password hash is never cached, so it is blank here:
+    load the user fresh to check credentials.
+    """
+    data = await user_cache.get(user_id)
+    if data is not None:
+        return User.model_validate({**data, "password": ""})
+
+    user = await User.get(PydanticObjectId(user_id))
+    if user:
+        await user_cache.set(user_id, user.model_dump(mode="json", exclude={"password"}))
+        user.password = ""
+    return user
 
 
 class FastJWT:
@@ -13,6 +37,8 @@ class FastJWT:
         self.access_secret = config.JWT_SECRET_KEY
         self.otp_secret = f"{config.JWT_SECRET_KEY}_otp"
         self.algorithm = "HS256"
+        # Verified access token claims, keyed by the token's sha256
+        self.verified = TTLCache(maxsize=config.JWT_CACHE_SIZE, ttl=config.JWT_CACHE_TTL)
 
     # --------------------
     # Encode
@@ -22,10 +48,10 @@ class FastJWT:
         self,
         *,
         data: dict,
-        expires_in_days: int = 30,
+        expires_in_days: int = config.JWT_ACCESS_EXPIRE_DAYS,
     ) -> str:
         return self._encode(
-            data=data,
+            data={**data, "jti": uuid4().hex},
             secret=self.access_secret,
             expires_in_seconds=expires_in_days * 86400,
         )
@@ -63,7 +89,17 @@ class FastJWT:
     # --------------------
 
     async def decode_access(self, token: str) -> dict:
-        return self._decode(token, self.access_secret)
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.verified.get(key)
+        if payload is not None and payload["exp"] > time.time():
+            return dict(payload)
+
+        payload = self._decode(token, self.access_secret)
+        # Never outlive the token itself, so an expired token is re-verified (and rejected)
+        ttl = min(config.JWT_CACHE_TTL, payload["exp"] - time.time())
+        if ttl > 0:
+            self.verified.set(key, payload, ttl=ttl)
+        return dict(payload)
 
     async def decode_otp(self, token: str) -> dict:
         return self._decode(token, self.otp_secret)
@@ -80,32 +116,47 @@ class FastJWT:
     # Dependency
     # --------------------
 
+    @staticmethod
+    def get_token(request: Request, access_token: str | None) -> str | None:
+        if access_token:
+            return access_token
+
+        auth = request.headers.get("Authorization")
+        if auth and auth.startswith("Bearer "):
+            return auth.removeprefix("Bearer ").strip()
+        return None
+
     async def login_required(
         self,
         request: Request,
         access_token: str | None = Cookie(default=None),
     ) -> User:
-        token = access_token
-
-        if not token:
-            auth = request.headers.get("Authorization")
-            if auth and auth.startswith("Bearer "):
-                token = auth.removeprefix("Bearer ").strip()
+        # Router-level and endpoint-level dependencies resolve the user only once
+        user = getattr(request.state, "user", None)
+        if user is not None:
+            return user
 
+        token = self.get_token(request, access_token)
         if not token:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
         payload = await self.decode_access(token)
+        if await revocation.is_revoked(payload):
+            raise HTTPException(status_code=401, detail="Token revoked")
 
         user_id = payload.get("id")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = await User.get(PydanticObjectId(user_id))
+        user = await get_cached_user(user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
 
         if not user.email_verified:
             raise HTTPException(status_code=403, detail="Email not verified")
 
+        request.state.user = user
         return user
+
+
+fast_jwt = FastJWT()
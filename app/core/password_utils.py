@@ -3,7 +3,21 @@ import string
 
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from app.core.config import config
+from app.utils.executor import BoundedExecutor
+
+
+def _argon2_settings() -> dict:
+    """Argon2 cost overrides from config, passlib defaults otherwise."""
+    settings = {
+        "argon2__time_cost": config.ARGON2_TIME_COST,
+        "argon2__memory_cost": config.ARGON2_MEMORY_COST,
+        "argon2__parallelism": config.ARGON2_PARALLELISM,
+    }
+    return {key: value for key, value in settings.items() if value is not None}
+
+
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", **_argon2_settings())
 
 MAX_BCRYPT_BYTES = 72
 
@@ -18,6 +32,32 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(
+    plain_password, hashed_password
+) -> tuple[bool, str | None]:
+    """Also returns a new hash when the stored one uses outdated parameters."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher(BoundedExecutor):
+    """
+    Runs Argon2 off the event loop. argon2-cffi releases the GIL, so up to
+    PASSWORD_HASH_WORKERS hashes run in parallel and the rest wait their turn.
+    """
+
+    def __init__(self):
+        super().__init__("argon2", config.PASSWORD_HASH_WORKERS)
+
+    async def verify(self, plain_password, hashed_password) -> tuple[bool, str | None]:
+        return await self.run(verify_and_update_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(get_password_hash, password)
+
+
+password_hasher = PasswordHasher()
+
+
 def generate_password(length: int = 10) -> str:
     """Returns a random string of length"""
     alphabet = string.ascii_letters + string.digits
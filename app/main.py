@@ -4,29 +4,62 @@ from contextlib import asynccontextmanager
 
 import sentry_sdk
 from beanie import init_beanie
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.starlette import StarletteIntegration
 
 from api.router import router as api_router
 from app.core.config import config
-from app.core.database import db
-from app.utils.redis import init_redis
+from app.core.database import db, init_transactions
+from app.core.email import smtp_pool
+from app.core.indexes import report_index_conflicts, verify_indexes
+from app.core.password_utils import password_hasher
+from app.utils.email_outbox import OUTBOX_KEY, email_outbox
+from app.utils.flags import flag_snapshot
+from app.utils.idempotency import idempotency
+from app.utils.images import image_processor
+from app.utils.metrics import (
+    MetricsMiddleware,
+    component_gauges,
+    metrics_auth,
+    monitor_event_loop,
+)
+from app.utils.proximity_cache import proximity_cache
+from app.utils.redis import close_redis, init_redis
 from app.utils.redis import manager as redis_manager
-from app.utils.reminders import schedule_reminders
-from app.utils.telegram import send_telegram_msg
+from app.utils.reminders import DUE_KEY, recover_active_sessions
+from app.utils.reminders import scheduler as reminder_scheduler
+from app.utils.revocation import revocation
+from app.utils.user_cache import user_cache
+from app.utils.session_events import event_dispatcher
+from app.utils.telegram import send_telegram_msg, telegram
+from app.utils.uploads import UploadLimitMiddleware
 from models.models import (
     Car,
     OTPActivationModel,
     ParkingLocation,
     ParkingSession,
-    ParkingSessionStatus,
     PasswordResetToken,
+    SessionEvent,
+    SessionEventStatus,
     User,
     UserParkingLocation,
 )
 
+DOCUMENT_MODELS = [
+    User,
+    OTPActivationModel,
+    PasswordResetToken,
+    Car,
+    ParkingLocation,
+    UserParkingLocation,
+    ParkingSession,
+    SessionEvent,
+]
+
 if not os.path.exists("static/cars"):
     os.makedirs("static/cars")
 
@@ -34,6 +67,79 @@ if not os.path.exists("static/sessions"):
     os.makedirs("static/sessions")
 
 
+def register_component_metrics() -> None:
+    """Queue depths and component state, read whenever metrics are collected."""
+    component_gauges.gauge(
+        "parkomat_telegram_queue_depth",
+        "Telegram messages waiting to be sent",
+        fn=lambda: telegram.queue_depth,
+    )
+    component_gauges.gauge(
+        "parkomat_image_queue_depth",
+        "Photos waiting for an image worker",
+        fn=lambda: image_processor.stats["waiting"],
+    )
+    component_gauges.gauge(
+        "parkomat_password_hash_queue_depth",
+        "Password hashes waiting for a hashing thread",
+        fn=lambda: password_hasher.stats["waiting"],
+    )
+    component_gauges.gauge(
+        "parkomat_reminders_due",
+        "Reminders scheduled in Redis and not yet claimed",
+        fn=lambda: redis_manager.client.zcard(DUE_KEY),
+        shared=True,
+    )
+    component_gauges.gauge(
+        "parkomat_email_outbox_depth",
+        "Emails in the Redis outbox waiting to be sent",
+        fn=lambda: redis_manager.client.zcard(OUTBOX_KEY),
+        shared=True,
+    )
+    component_gauges.gauge(
+        "parkomat_session_events_pending",
+        "Session lifecycle events waiting for the dispatcher",
+        fn=lambda: SessionEvent.get_pymongo_collection().count_documents(
+            {"status": SessionEventStatus.PENDING.value}
+        ),
+        shared=True,
+    )
+    component_gauges.gauge(
+        "parkomat_flags_snapshot_age_seconds",
+        "Seconds since the feature flags snapshot was refreshed",
+        fn=lambda: flag_snapshot.age,
+    )
+    component_gauges.gauge(
+        "parkomat_flags_refresh_failures",
+        "Failed feature flag refreshes since startup",
+        fn=lambda: flag_snapshot.stats["refresh_failures"],
+    )
+
+    register_stats("proximity_cache", proximity_cache, "Proximity cache")
+    register_stats("token_revocation", revocation, "Token revocation checks")
+    register_stats("idempotency", idempotency, "Idempotent requests")
+    register_stats("user_cache", user_cache, "User cache lookups")
+
+
+def register_stats(prefix: str, component, help: str) -> None:
+    """One per-worker gauge for each counter in `component.stats`."""
+    for key in component.stats:
+        component_gauges.gauge(
+            f"parkomat_{prefix}_{key}",
+            f"{help}: {key.replace('_', ' ')} since the worker started",
+            fn=lambda key=key: component.stats[key],
+        )
+
+
+register_component_metrics()
+
+
+def report_recovery(task: asyncio.Task) -> None:
+    """Done-callback of the reminder recovery task, which nothing awaits."""
+    if not task.cancelled() and task.exception():
+        print(f"Reminder recovery failed: {task.exception()!r}")
+
+
 def init_sentry() -> None:
     if not config.SENTRY_DSN:
         return
@@ -50,48 +156,71 @@ def init_sentry() -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_redis()
+    await component_gauges.start()
+    loop_monitor = asyncio.create_task(monitor_event_loop())
+    await revocation.start()
+    await user_cache.start()
 
+    # The models' Settings.indexes are built here. Data or indexes that would
+    # make that fail (duplicates, changed options) are only reported: the app
+    # starts without building indexes until scripts/migrate_indexes.py ran.
+    # Undeclared indexes are only dropped when MONGO_DROP_UNDECLARED_INDEXES.
+    conflicts = await report_index_conflicts(db, DOCUMENT_MODELS)
     await init_beanie(
         database=db,
-        document_models=[
-            User,
-            OTPActivationModel,
-            PasswordResetToken,
-            Car,
-            ParkingLocation,
-            UserParkingLocation,
-            ParkingSession,
-        ],
+        document_models=DOCUMENT_MODELS,
+        allow_index_dropping=config.MONGO_DROP_UNDECLARED_INDEXES,
+        skip_indexes=conflicts,
     )
+    await verify_indexes(DOCUMENT_MODELS)
+    await init_transactions()
 
-    active_sessions = await ParkingSession.find(
-        ParkingSession.status == ParkingSessionStatus.ACTIVE
-    ).to_list()
-
-    for session in active_sessions:
-        user = await User.get(session.user_id)
-        if user and user.telegram_chat_id:
-            asyncio.create_task(
-                schedule_reminders(
-                    user.telegram_chat_id, session.end_time, str(session.id)
-                )
-            )
-            print(f"🚀 Recovered reminder task for session: {session.id}")
+    # Runs in the background: reminders already in Redis keep firing meanwhile
+    recovery = asyncio.create_task(recover_active_sessions())
+    recovery.add_done_callback(report_recovery)
+
+    image_processor.start()
+    password_hasher.start()
+    await telegram.start()
+    await reminder_scheduler.start()
+    await email_outbox.start()
+    await event_dispatcher.start()
+    await flag_snapshot.start()
 
     yield
 
+    recovery.cancel()
+    await flag_snapshot.stop()
+    await event_dispatcher.stop()
+    await email_outbox.stop()
+    await smtp_pool.close()
+    await reminder_scheduler.stop()
+    await telegram.stop()
+    image_processor.stop()
+    password_hasher.stop()
+    await revocation.stop()
+    await user_cache.stop()
+    loop_monitor.cancel()
+    await component_gauges.stop()
+    await close_redis()
+
 
 def get_application():
     init_sentry()
     _app = FastAPI(title=config.PROJECT_NAME, lifespan=lifespan)
 
+    # Inside CORS, so browsers can read the 413
+    _app.add_middleware(UploadLimitMiddleware)
     _app.add_middleware(
         CORSMiddleware,
         allow_origins=config.BACKEND_CORS_ORIGINS,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Paginated GET /session returns the next page's cursor in a header
+        expose_headers=["X-Next-Cursor"],
     )
+    _app.add_middleware(MetricsMiddleware)
     return _app
 
 
@@ -117,6 +246,11 @@ async def health():
     return health_status
 
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(metrics_auth)])
+async def metrics():
+    return Response(await component_gauges.render(), media_type=CONTENT_TYPE_LATEST)
+
+
 app.include_router(api_router)
 
 
@@ -132,18 +266,20 @@ async def telegram_webhook(update: dict):
         user = await User.find_one(User.connection_code == text)
 
         if user:
-            user.telegram_chat_id = str(chat_id)
-            user.connection_code = None
-            await user.save()
+            await user.set(
+                {User.telegram_chat_id: str(chat_id), User.connection_code: None}
+            )
 
-            await send_telegram_msg(
-                chat_id,
+            reply = (
                 "<b>Success!</b> 🚗 Your account is now linked. "
-                "I will send your parking reminders here.",
+                "I will send your parking reminders here."
             )
         else:
-            await send_telegram_msg(
-                chat_id, "❌ <b>Invalid Code.</b> Please check the app for a new code."
-            )
+            reply = "❌ <b>Invalid Code.</b> Please check the app for a new code."
+
+        try:
+            await send_telegram_msg(chat_id, reply)
+        except Exception as e:
+            print(f"Failed to send telegram message: {e}")
 
     return {"ok": True}
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import time
+import uuid
+
+import aiosmtplib
+
+from app.core.config import config
+from app.core.email import send_template
+from app.utils.redis import manager
+from app.utils.leases import CLAIM_SCRIPT, REQUEUE_SCRIPT
+
+# Sorted sets scored by unix timestamp of the next attempt, members are JSON
+OUTBOX_KEY = "email:outbox"
+PROCESSING_KEY = "email:processing"
+
+
+def is_permanent(error: Exception) -> bool:
+    """Failures a retry can't fix, like a recipient the server rejects outright (5xx)."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(refused.code >= 500 for refused in error.recipients)
+    return isinstance(error, aiosmtplib.SMTPRecipientRefused) and error.code >= 500
+
+
+class EmailOutbox:
+    """
+    Durable email queue in Redis. Requests only enqueue; a worker claims
+    due messages in batches with a lease (like the reminder scheduler),
+    sends them over the SMTP pool and reschedules failures with backoff.
+    """
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.stats = {"enqueued": 0, "sent": 0, "retried": 0, "dropped": 0, "errors": 0}
+
+    async def enqueue(self, to: str, template: str, **fields) -> bool:
+        """Queues an email; False (logged) when Redis is unavailable."""
+        message = {
+            "id": uuid.uuid4().hex,
+            "to": to,
+            "template": template,
+            "fields": fields,
+            "attempts": 0,
+        }
+        try:
+            await manager.client.zadd(OUTBOX_KEY, {json.dumps(message): time.time()})
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Could not queue {template} email to {to}: {e}")
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    async def start(self):
+        self.claim = manager.client.register_script(CLAIM_SCRIPT)
+        self.requeue = manager.client.register_script(REQUEUE_SCRIPT)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        while True:
+            try:
+                claimed = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Email outbox poll failed: {e}")
+                claimed = 0
+
+            if claimed < config.EMAIL_BATCH_SIZE:
+                await asyncio.sleep(config.EMAIL_POLL_INTERVAL)
+
+    async def poll_once(self) -> int:
+        now = time.time()
+        keys = [OUTBOX_KEY, PROCESSING_KEY]
+
+        await self.requeue(keys=keys, args=[now, config.EMAIL_BATCH_SIZE])
+        members = await self.claim(
+            keys=keys,
+            args=[now, config.EMAIL_BATCH_SIZE, now + config.EMAIL_LEASE_SECONDS],
+        )
+
+        # The pool caps how many of these actually talk to the server at once
+        await asyncio.gather(*(self.process(member) for member in members))
+        return len(members)
+
+    async def process(self, member: str):
+        try:
+            message = json.loads(member)
+            await send_template(message["to"], message["template"], message["fields"])
+            self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.retry(member, e)
+
+        await manager.client.zrem(PROCESSING_KEY, member)
+
+    async def retry(self, member: str, error: Exception):
+        try:
+            message = json.loads(member)
+        except ValueError:
+            print(f"Dropping malformed email: {member}")
+            self.stats["dropped"] += 1
+            return
+
+        message["attempts"] += 1
+        if is_permanent(error) or message["attempts"] >= config.EMAIL_MAX_ATTEMPTS:
+            print(f"Giving up on email {message['id']} to {message['to']}: {error}")
+            self.stats["dropped"] += 1
+            return
+
+        delay = config.EMAIL_RETRY_DELAY * 2 ** (message["attempts"] - 1)
+        print(f"Email {message['id']} failed ({error}), retrying in {delay}s")
+        await manager.client.zadd(OUTBOX_KEY, {json.dumps(message): time.time() + delay})
+        self.stats["retried"] += 1
+
+
+email_outbox = EmailOutbox()
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    Runs blocking functions off the event loop in a thread pool. At most
+    `workers` run at once; the rest wait for a slot, and once `max_queue`
+    are waiting, run() raises `busy_error` instead of queueing more.
+    """
+
+    busy_error: type[Exception] = ExecutorBusyError
+
+    def __init__(self, name: str, workers: int, max_queue: Optional[int] = None):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor: ThreadPoolExecutor | None = None
+        self.semaphore = asyncio.Semaphore(workers)
+        self.stats = {
+            "waiting": 0,
+            "active": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "queue_time_total": 0.0,
+            "queue_time_max": 0.0,
+            "run_time_total": 0.0,
+            "run_time_max": 0.0,
+        }
+
+    def start(self):
+        if not self.executor:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix=self.name
+            )
+
+    def stop(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def observe(self, seconds: float, outcome: str):
+        """Called with the run time (queueing excluded) of every call."""
+
+    async def run(self, func, *args):
+        self.start()
+
+        if self.max_queue is not None and self.stats["waiting"] >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise self.busy_error()
+
+        queued_at = time.perf_counter()
+        self.stats["waiting"] += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.stats["waiting"] -= 1
+
+        started_at = time.perf_counter()
+        queue_time = started_at - queued_at
+        self.stats["queue_time_total"] += queue_time
+        self.stats["queue_time_max"] = max(self.stats["queue_time_max"], queue_time)
+        self.stats["active"] += 1
+        outcome = "ok"
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(func, *args)
+            )
+        except Exception:
+            self.stats["failed"] += 1
+            outcome = "error"
+            raise
+        finally:
+            self.stats["active"] -= 1
+            self.stats["completed"] += 1
+            self.semaphore.release()
+
+            elapsed = time.perf_counter() - started_at
+            self.stats["run_time_total"] += elapsed
+            self.stats["run_time_max"] = max(self.stats["run_time_max"], elapsed)
+            self.observe(elapsed, outcome)
@@ -1,7 +1,12 @@
+import asyncio
+import random
+import time
+
 from fastapi import Depends, HTTPException, status
 from flagsmith import Flagsmith
 
 from app.core.config import config
+from app.utils.cache import TTLCache
 
 
 class MockFlagsmith:
@@ -27,6 +32,9 @@ if config.FLAGSMITH_TOKEN:
     try:
         flagsmith = Flagsmith(
             environment_key=config.FLAGSMITH_TOKEN,
+            # Server-side keys download the environment and evaluate locally
+            enable_local_evaluation=config.FLAGSMITH_TOKEN.startswith("ser."),
+            environment_refresh_interval_seconds=config.FLAGS_REFRESH_INTERVAL,
         )
     except Exception:
         flagsmith = MockFlagsmith(default_value=True)
@@ -34,26 +42,107 @@ else:
     flagsmith = MockFlagsmith(default_value=True)
 
 
-def get_flags():
+class FlagSnapshot:
+    """
+    Environment flags held in memory and refreshed in the background every
+    FLAGS_REFRESH_INTERVAL seconds (with jitter, so workers don't refresh in
+    lockstep). Request handlers read the snapshot without any I/O and keep
+    the last good one when a refresh fails.
+    """
+
+    def __init__(self):
+        self.flags = MockFlagsmith(default_value=True)
+        self.updated_at: float | None = None
+        self.identities = TTLCache(
+            maxsize=config.FLAGS_IDENTITY_CACHE_SIZE, ttl=config.FLAGS_IDENTITY_CACHE_TTL
+        )
+        self.task: asyncio.Task | None = None
+        self.stats = {
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "identity_hits": 0,
+            "identity_misses": 0,
+        }
+
+    @property
+    def age(self) -> float | None:
+        """Seconds since the last successful refresh, None if there never was one."""
+        if self.updated_at is None:
+            return None
+        return time.monotonic() - self.updated_at
+
+    async def start(self):
+        if not hasattr(flagsmith, "get_environment_flags"):
+            return
+        await self.refresh()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        while True:
+            jitter = random.uniform(
+                -config.FLAGS_REFRESH_JITTER, config.FLAGS_REFRESH_JITTER
+            )
+            await asyncio.sleep(config.FLAGS_REFRESH_INTERVAL * (1 + jitter))
+            await self.refresh()
+
+    async def refresh(self):
+        try:
+            self.flags = await asyncio.to_thread(flagsmith.get_environment_flags)
+        except Exception as e:
+            self.stats["refresh_failures"] += 1
+            print(f"Feature flags refresh failed: {e}")
+            return
+
+        self.updated_at = time.monotonic()
+        self.stats["refreshes"] += 1
+
+    async def get_user_flags(self, user_id: str):
+        if not hasattr(flagsmith, "get_identity_flags"):
+            return flagsmith
+
+        flags = self.identities.get(user_id)
+        if flags is not None:
+            self.stats["identity_hits"] += 1
+            return flags
+
+        self.stats["identity_misses"] += 1
+        try:
+            flags = await asyncio.to_thread(
+                flagsmith.get_identity_flags, identifier=user_id
+            )
+        except Exception as e:
+            print(f"Identity flags fetch failed: {e}")
+            return self.flags
+
+        self.identities.set(user_id, flags)
+        return flags
+
+
+flag_snapshot = FlagSnapshot()
+
+
+async def get_flags():
     """
     FastAPI Dependency.
-    Returns either real environment flags or the Mock client.
+    Returns the in-memory flags snapshot (or the Mock client).
     """
-    try:
-        if hasattr(flagsmith, "get_environment_flags"):
-            return flagsmith.get_environment_flags()
-        return flagsmith
-    except Exception:
-        return MockFlagsmith(default_value=True)
+    return flag_snapshot.flags
 
 
-def get_user_flags(user_id: str):
+async def get_user_flags(user_id: str):
     """
-    Helper for identity-based flags.
+    Helper for identity-based flags, cached for FLAGS_IDENTITY_CACHE_TTL.
     """
-    if hasattr(flagsmith, "get_identity_flags"):
-        return flagsmith.get_identity_flags(identifier=user_id)
-    return flagsmith
+    return await flag_snapshot.get_user_flags(user_id)
 
 
 def signup_enabled(flags=Depends(get_flags)):
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from starlette.datastructures import UploadFile
+
+from app.core.config import config
+from app.core.jwt import fast_jwt
+from app.utils.redis import manager
+from app.utils.revocation import revocation
+
+HEADER = "Idempotency-Key"
+KEY_PREFIX = "idempotency"
+MAX_KEY_LENGTH = 255
+CHUNK = 64 * 1024
+FORM_TYPES = ("multipart/form-data", "application/x-www-form-urlencoded")
+
+
+def idempotent(endpoint: Callable) -> Callable:
+    """Marks an endpoint of an IdempotentRoute router as honouring Idempotency-Key."""
+    endpoint.idempotent = True
+    return endpoint
+
+
+async def request_digest(request: Request) -> str:
+    """
+    Hash of the request body: the parsed form fields (uploads by content)
+    for forms, the raw body otherwise. Starlette caches both on the request,
+    so the endpoint doesn't parse them again.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(FORM_TYPES):
+        return hashlib.sha256(await request.body()).hexdigest()
+
+    digest = hashlib.sha256()
+    form = await request.form()
+    for name, value in sorted(form.multi_items(), key=lambda item: item[0]):
+        if isinstance(value, UploadFile):
+            content = hashlib.sha256()
+            while chunk := await value.read(CHUNK):
+                content.update(chunk)
+            await value.seek(0)
+            value = f"{value.filename}:{content.hexdigest()}"
+        digest.update(json.dumps([name, value]).encode())
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Remembers the response to each (user, Idempotency-Key) in Redis. The
+    first request stores an in-flight marker and runs; duplicates arriving
+    meanwhile wait for its result, later retries get it replayed, without
+    image work or database writes. Requests are told apart by method, path
+    and body digest: reusing a key for a different body is a 422. Only
+    successful responses are remembered; client and server errors can be
+    retried (e.g. with a fixed photo).
+    """
+
+    def __init__(self):
+        self.stats = {"executed": 0, "replayed": 0, "waited": 0, "errors": 0}
+
+    @staticmethod
+    async def user_scope(request: Request) -> str | None:
+        """The caller's user id; None leaves authentication to the endpoint."""
+        token = fast_jwt.get_token(request, request.cookies.get("access_token"))
+        if not token:
+            return None
+        try:
+            payload = await fast_jwt.decode_access(token)
+        except HTTPException:
+            return None
+        if await revocation.is_revoked(payload):
+            return None
+        return payload.get("id")
+
+    @staticmethod
+    def replay(entry: dict) -> Response:
+        return Response(
+            content=entry["body"],
+            status_code=entry["status"],
+            media_type=entry["media_type"],
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    async def claim(self, key: str, fingerprint: str) -> Response | None:
+        """Takes the in-flight marker (None) or returns the first request's response."""
+        marker = json.dumps({"state": "in_flight", "fingerprint": fingerprint})
+        deadline = time.monotonic() + config.IDEMPOTENCY_WAIT_TIMEOUT
+        waited = False
+
+        while True:
+            if await manager.client.set(
+                key, marker, nx=True, ex=config.IDEMPOTENCY_LOCK_TTL
+            ):
+                return None
+
+            stored = await manager.client.get(key)
+            if stored is None:
+                # The first request failed and released the key: take over
+                continue
+
+            entry = json.loads(stored)
+            if entry["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"{HEADER} was already used for a different request",
+                )
+            if entry["state"] == "done":
+                self.stats["replayed"] += 1
+                return self.replay(entry)
+
+            if not waited:
+                waited = True
+                self.stats["waited"] += 1
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"A request with this {HEADER} is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            await asyncio.sleep(config.IDEMPOTENCY_POLL_INTERVAL)
+
+    async def finish(
+        self,
+        key: str,
+        fingerprint: str,
+        status: int,
+        body: bytes | None,
+        media_type: str | None,
+    ):
+        try:
+            if body is None or status >= 400:
+                await manager.client.delete(key)
+                return
+
+            entry = {
+                "state": "done",
+                "fingerprint": fingerprint,
+                "status": status,
+                "body": body.decode(),
+                "media_type": media_type,
+            }
+            await manager.client.set(key, json.dumps(entry), ex=config.IDEMPOTENCY_TTL)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Idempotency store failed for {key}: {e}")
+
+    async def handle(
+        self,
+        request: Request,
+        idempotency_key: str,
+        handler: Callable[[Request], Awaitable[Response]],
+    ) -> Response:
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Invalid {HEADER} header")
+
+        user_id = await self.user_scope(request)
+        if user_id is None:
+            return await handler(request)
+
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        key = f"{KEY_PREFIX}:{user_id}:{digest}"
+        fingerprint = f"{request.method} {request.url.path} {await request_digest(request)}"
+
+        try:
+            replayed = await self.claim(key, fingerprint)
+        except HTTPException:
+            raise
+        except Exception as e:
+            # Without Redis the endpoint still works, just without the guarantee
+            self.stats["errors"] += 1
+            print(f"Idempotency check failed, running {request.url.path} anyway: {e}")
+            return await handler(request)
+        if replayed is not None:
+            return replayed
+
+        self.stats["executed"] += 1
+        try:
+            response = await handler(request)
+        except HTTPException as e:
+            body = json.dumps({"detail": e.detail}).encode()
+            await self.finish(key, fingerprint, e.status_code, body, "application/json")
+            raise
+        except BaseException:
+            await self.finish(key, fingerprint, 500, None, None)
+            raise
+
+        await self.finish(
+            key,
+            fingerprint,
+            response.status_code,
+            getattr(response, "body", None),
+            response.media_type,
+        )
+        return response
+
+
+idempotency = IdempotencyStore()
+
+
+class IdempotentRoute(APIRoute):
+    """Route class for routers whose @idempotent endpoints accept Idempotency-Key."""
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+        if not getattr(self.endpoint, "idempotent", False):
+            return handler
+
+        async def route_handler(request: Request) -> Response:
+            idempotency_key = request.headers.get(HEADER)
+            if idempotency_key is None:
+                return await handler(request)
+            return await idempotency.handle(request, idempotency_key, handler)
+
+        return route_handler
@@ -0,0 +1,90 @@
+from io import BytesIO
+from typing import BinaryIO
+
+from PIL import Image
+
+from app.core.config import config
+from app.utils.executor import BoundedExecutor
+from app.utils.metrics import IMAGE_PROCESS_SECONDS
+
+# Pillow registers most plugins lazily; Image.open(formats=...) needs them all
+Image.init()
+
+
+class ImageProcessingError(Exception):
+    status_code = 400
+    detail = "Invalid image"
+
+
+class ImageTooLargeError(ImageProcessingError):
+    status_code = 413
+    detail = "Image is too large"
+
+
+class ImageProcessorBusyError(ImageProcessingError):
+    status_code = 503
+    detail = "Image processing is busy, please try again"
+
+
+def sniff_image(source: BinaryIO) -> tuple[str, int, int]:
+    """
+    Identifies an upload from its header alone (format and dimensions, no
+    decoding), so bad or oversized photos are rejected before any work.
+    """
+    try:
+        with Image.open(source, formats=config.IMAGE_FORMATS) as img:
+            image_format, (width, height) = img.format, img.size
+    except Image.DecompressionBombError:
+        raise ImageTooLargeError()
+    except (OSError, SyntaxError, ValueError):
+        # UnidentifiedImageError, truncated or malformed headers
+        raise ImageProcessingError()
+    finally:
+        source.seek(0)
+
+    if width * height > config.IMAGE_MAX_PIXELS:
+        raise ImageTooLargeError()
+    return image_format, width, height
+
+
+def convert_to_jpeg(source: bytes | BinaryIO, file_path: str):
+    """Runs in a worker thread. Pillow releases the GIL while decoding/encoding."""
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    with Image.open(source, formats=config.IMAGE_FORMATS) as img:
+        # Image.open only parses the header, so this runs before any decoding
+        width, height = img.size
+        if width * height > config.IMAGE_MAX_PIXELS:
+            raise ImageTooLargeError()
+
+        # JPEGs get decoded straight at 1/2, 1/4 or 1/8 scale, then
+        # thumbnail() finishes with reduce() + resample on the small image
+        max_size = (config.IMAGE_MAX_DIMENSION, config.IMAGE_MAX_DIMENSION)
+        img.draft("RGB", max_size)
+        img.thumbnail(max_size)
+
+        # Convert to RGB (required for PNG to JPG conversion)
+        rgb_img = img.convert("RGB")
+        rgb_img.save(file_path, "JPEG", quality=config.IMAGE_JPEG_QUALITY)
+
+
+class ImageProcessor(BoundedExecutor):
+    """
+    Converts uploads to JPEG off the event loop. At most IMAGE_WORKERS images
+    are processed at once and at most IMAGE_MAX_QUEUE wait for a slot.
+    """
+
+    busy_error = ImageProcessorBusyError
+
+    def __init__(self):
+        super().__init__("images", config.IMAGE_WORKERS, config.IMAGE_MAX_QUEUE)
+
+    def observe(self, seconds: float, outcome: str):
+        IMAGE_PROCESS_SECONDS.labels(outcome).observe(seconds)
+
+    async def save_as_jpeg(self, source: bytes | BinaryIO, file_path: str):
+        await self.run(convert_to_jpeg, source, file_path)
+
+
+image_processor = ImageProcessor()
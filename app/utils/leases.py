@@ -0,0 +1,24 @@
+# Lease scripts shared by the Redis queues (reminders, email outbox). Both
+# keep a sorted set of due members (KEYS[1]) and one of claimed members
+# (KEYS[2]), scored by unix timestamp.
+
+# Moves due members into the processing set with a lease, so only one
+# worker ever claims a given member.
+CLAIM_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('ZADD', KEYS[2], ARGV[3], member)
+end
+return due
+"""
+
+# Puts back members whose lease expired (the worker died mid-delivery).
+REQUEUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZADD', KEYS[1], ARGV[1], member)
+end
+return #expired
+"""
@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any, Optional
+
+from beanie import Document, PydanticObjectId
+from fastapi import Request
+
+from models.models import Car, ParkingLocation, ParkingSession, User
+
+
+class DocumentLoader:
+    """
+    DataLoader for one collection: load(id) calls made in the same event
+    loop tick are coalesced into a single {"_id": {"$in": [...]}} query,
+    and results are memoized for the lifetime of the loader.
+    """
+
+    def __init__(self, model: type[Document]):
+        self.model = model
+        self.cache: dict[PydanticObjectId, asyncio.Future] = {}
+        self.pending: list[PydanticObjectId] = []
+        # The loop only keeps weak references to tasks
+        self.dispatches: set[asyncio.Task] = set()
+
+    def load(self, document_id: Any) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+
+        if document_id is None:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+
+        document_id = PydanticObjectId(document_id)
+        future = self.cache.get(document_id)
+        if future is not None:
+            return future
+
+        future = loop.create_future()
+        self.cache[document_id] = future
+        self.pending.append(document_id)
+        if len(self.pending) == 1:
+            # Runs after every task already scheduled for this tick had its chance to load()
+            loop.call_soon(self.schedule_dispatch)
+        return future
+
+    def schedule_dispatch(self):
+        task = asyncio.ensure_future(self.dispatch())
+        self.dispatches.add(task)
+        task.add_done_callback(self.dispatches.discard)
+
+    async def load_many(self, document_ids: list[Any]) -> list[Optional[Document]]:
+        return await asyncio.gather(*(self.load(document_id) for document_id in document_ids))
+
+    async def dispatch(self):
+        document_ids, self.pending = self.pending, []
+
+        try:
+            documents = await self.model.find({"_id": {"$in": document_ids}}).to_list()
+        except Exception as e:
+            for document_id in document_ids:
+                self.cache.pop(document_id).set_exception(e)
+            return
+
+        found = {document.id: document for document in documents}
+        for document_id in document_ids:
+            self.cache[document_id].set_result(found.get(document_id))
+
+
+class Loaders:
+    def __init__(self):
+        self.car = DocumentLoader(Car)
+        self.location = DocumentLoader(ParkingLocation)
+        self.session = DocumentLoader(ParkingSession)
+        self.user = DocumentLoader(User)
+
+
+def get_loaders(request: Request) -> Loaders:
+    """FastAPI dependency: one set of loaders per request."""
+    loaders = getattr(request.state, "loaders", None)
+    if loaders is None:
+        loaders = request.state.loaders = Loaders()
+    return loaders
@@ -0,0 +1,194 @@
+import asyncio
+import hmac
+import inspect
+import os
+import time
+from typing import Callable
+
+from fastapi import Header, HTTPException
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app.core.config import config
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# With uvicorn --workers every worker writes its series to files in this
+# directory and a scrape of any worker reads all of them. Read by
+# prometheus_client at import, so it must be set in the process environment.
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+class ComponentGauges:
+    """
+    Gauges read from a function (queue depths, component state). Per-worker
+    ones are refreshed by every worker each METRICS_COLLECT_INTERVAL and keep
+    a `pid` label; shared ones read state common to all workers (e.g. a Redis
+    queue) and are refreshed by the worker serving the scrape.
+    """
+
+    def __init__(self):
+        self.local: list[tuple[str, Gauge, Callable]] = []
+        self.shared: list[tuple[str, Gauge, Callable]] = []
+        self.task: asyncio.Task | None = None
+
+    def gauge(self, name: str, help: str, fn: Callable, shared=False) -> Gauge:
+        mode = "mostrecent" if shared else "liveall"
+        gauge = Gauge(name, help, multiprocess_mode=mode)
+        (self.shared if shared else self.local).append((name, gauge, fn))
+        return gauge
+
+    async def collect(self, gauges: list[tuple[str, Gauge, Callable]]):
+        for name, gauge, fn in gauges:
+            try:
+                value = fn()
+                if inspect.isawaitable(value):
+                    value = await value
+            except Exception as e:
+                print(f"Metric {name} collection failed: {e}")
+                continue
+            if value is not None:
+                gauge.set(value)
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if MULTIPROC_DIR:
+            # Drops this worker's live gauges; counters and histograms stay
+            multiprocess.mark_process_dead(os.getpid())
+
+    async def run(self):
+        while True:
+            await self.collect(self.local)
+            await asyncio.sleep(config.METRICS_COLLECT_INTERVAL)
+
+    async def render(self) -> bytes:
+        await self.collect(self.local)
+        await self.collect(self.shared)
+        if not MULTIPROC_DIR:
+            return generate_latest(REGISTRY)
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+
+
+component_gauges = ComponentGauges()
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "parkomat_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "parkomat_http_requests_in_flight",
+    "HTTP requests being served",
+    multiprocess_mode="livesum",
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "parkomat_mongo_command_duration_seconds",
+    "MongoDB command latency by collection",
+    ("command", "collection", "outcome"),
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_POOL_WAIT_SECONDS = Histogram(
+    "parkomat_mongo_pool_checkout_wait_seconds",
+    "Time spent waiting for a MongoDB connection from the pool",
+    ("outcome",),
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "parkomat_redis_command_duration_seconds",
+    "Redis command latency",
+    ("command", "outcome"),
+    buckets=LATENCY_BUCKETS,
+)
+IMAGE_PROCESS_SECONDS = Histogram(
+    "parkomat_image_processing_duration_seconds",
+    "Time spent converting an uploaded photo",
+    ("outcome",),
+    buckets=LATENCY_BUCKETS,
+)
+EVENT_LOOP_LAG = Histogram(
+    "parkomat_event_loop_lag_seconds",
+    "How late the event loop runs a scheduled callback",
+    buckets=LATENCY_BUCKETS,
+)
+EVENT_LOOP_LAG_MAX = Gauge(
+    "parkomat_event_loop_lag_max_seconds",
+    "Worst event loop lag over the last collection interval",
+    multiprocess_mode="liveall",
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Templates, not raw paths, so ids don't explode the label set
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    worst = 0.0
+    window_start = time.monotonic()
+    while True:
+        scheduled = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - scheduled - interval)
+        EVENT_LOOP_LAG.observe(lag)
+
+        worst = max(worst, lag)
+        EVENT_LOOP_LAG_MAX.set(worst)
+        if time.monotonic() - window_start >= config.METRICS_COLLECT_INTERVAL:
+            worst, window_start = 0.0, time.monotonic()
+
+
+def metrics_auth(authorization: str | None = Header(default=None)):
+    """Bearer METRICS_TOKEN; /metrics is disabled when no token is configured."""
+    if not config.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    expected = f"Bearer {config.METRICS_TOKEN}"
+    if not authorization or not hmac.compare_digest(
+        authorization.encode(), expected.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Unauthorized")
@@ -0,0 +1,83 @@
+import json
+import time
+from typing import Awaitable, Callable
+
+from app.core.config import config
+from app.utils.geo import geohash_center, geohash_encode
+from app.utils.redis import manager
+
+KEY_PREFIX = "proximity:public"
+# Bumped whenever a public location changes; old cells simply expire
+VERSION_KEY = f"{KEY_PREFIX}:version"
+
+# Reads the current version and the cell entry for that version in one round trip
+GET_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+return {version, redis.call('GET', ARGV[1] .. ':' .. version .. ':' .. ARGV[2])}
+"""
+
+
+class ProximityCache:
+    """
+    Caches the public parking locations nearest to the center of a geohash
+    cell. Every query falling in the same cell shares the entry; callers
+    recompute distances from their own point.
+    """
+
+    def __init__(self):
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "errors": 0,
+            "hit_seconds": 0.0,
+            "miss_seconds": 0.0,
+        }
+
+    async def get_candidates(
+        self,
+        lat: float,
+        lng: float,
+        fetch: Callable[[float, float], Awaitable[list[dict]]],
+    ) -> list[dict]:
+        started = time.perf_counter()
+        cell = geohash_encode(lat, lng, config.PROXIMITY_CACHE_PRECISION)
+
+        version, cached = None, None
+        try:
+            script = manager.client.register_script(GET_SCRIPT)
+            version, cached = await script(keys=[VERSION_KEY], args=[KEY_PREFIX, cell])
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Proximity cache read failed: {e}")
+
+        if cached is not None:
+            self.stats["hits"] += 1
+            self.stats["hit_seconds"] += time.perf_counter() - started
+            return json.loads(cached)
+
+        candidates = await fetch(*geohash_center(cell))
+
+        if version is not None:
+            try:
+                await manager.client.set(
+                    f"{KEY_PREFIX}:{version}:{cell}",
+                    json.dumps(candidates),
+                    ex=config.PROXIMITY_CACHE_TTL,
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Proximity cache write failed: {e}")
+
+        self.stats["misses"] += 1
+        self.stats["miss_seconds"] += time.perf_counter() - started
+        return candidates
+
+    async def invalidate(self):
+        try:
+            await manager.client.incr(VERSION_KEY)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Proximity cache invalidation failed: {e}")
+
+
+proximity_cache = ProximityCache()
@@ -0,0 +1,142 @@
+import ipaddress
+import math
+import time
+import uuid
+
+from fastapi import HTTPException, Request
+
+from app.core.config import config
+from app.core.password_utils import password_hasher
+from app.utils.redis import manager
+
+# Sliding-window log over several keys at once. ARGV holds now and a unique
+# member, then one (limit, window, record) triple per key, windows in
+# milliseconds. When every key is under its limit the attempt is added to the
+# keys with record = 1; otherwise returns how long until the oldest attempt
+# of the exhausted key leaves its window.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 3])
+    local window = tonumber(ARGV[i * 3 + 1])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        retry_after = math.max(retry_after, tonumber(oldest[2]) + window - now)
+    end
+end
+if retry_after > 0 then
+    return retry_after
+end
+for i, key in ipairs(KEYS) do
+    if ARGV[i * 3 + 2] == '1' then
+        redis.call('ZADD', key, now, ARGV[2])
+        redis.call('PEXPIRE', key, ARGV[i * 3 + 1])
+    end
+end
+return 0
+"""
+
+
+def trusted_proxies() -> list:
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in config.TRUSTED_PROXIES]
+
+
+def client_ip(request: Request) -> str:
+    """
+    The peer address, or when the peer is a trusted proxy, the right-most
+    X-Forwarded-For hop that isn't one (the earlier hops are client-supplied).
+    """
+    hops = [request.client.host if request.client else "unknown"]
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()] + hops
+
+    proxies = trusted_proxies()
+    for hop in reversed(hops):
+        try:
+            address = ipaddress.ip_address(hop)
+        except ValueError:
+            return hop
+        if not any(address in proxy for proxy in proxies):
+            return hop
+    return hops[0]
+
+
+class AuthRateLimiter:
+    """
+    Limits auth endpoints per client IP before any password hashing or email
+    sending happens. Per email, signin counts only failed attempts
+    (record_failure), so nobody can lock a user out of an account they can
+    sign in to; password reset counts every request. Fails open if Redis is
+    unavailable.
+    """
+
+    def __init__(self):
+        self.stats = {"allowed": 0, "limited": 0, "overloaded": 0, "errors": 0}
+
+    async def check(
+        self,
+        request: Request,
+        scope: str,
+        email: str | None = None,
+        count_email: bool = False,
+    ):
+        """
+        Records an attempt for the client IP; also refused once `email` has
+        AUTH_RATE_LIMIT_EMAIL attempts in the window. Those are the failures
+        from record_failure(), or with count_email every checked attempt
+        (e.g. reset emails, so one inbox can't be flooded).
+        """
+        # Hashing is already queued up: shed load instead of piling on more
+        if password_hasher.stats["waiting"] >= config.PASSWORD_HASH_MAX_QUEUE:
+            self.stats["overloaded"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+
+        window = config.AUTH_RATE_LIMIT_WINDOW * 1000
+        keys = [f"ratelimit:{scope}:ip:{client_ip(request)}"]
+        args = [int(time.time() * 1000), uuid.uuid4().hex, config.AUTH_RATE_LIMIT_IP, window, 1]
+        if email:
+            keys.append(self.email_key(scope, email))
+            args += [config.AUTH_RATE_LIMIT_EMAIL, window, int(count_email)]
+
+        try:
+            script = manager.client.register_script(SLIDING_WINDOW_SCRIPT)
+            retry_after = await script(keys=keys, args=args)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Rate limit check failed: {e}")
+            return
+
+        if retry_after:
+            self.stats["limited"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many attempts, please try again later",
+                headers={"Retry-After": str(math.ceil(retry_after / 1000))},
+            )
+        self.stats["allowed"] += 1
+
+    async def record_failure(self, scope: str, email: str):
+        """Counts a failed attempt against `email` (checked by the next check())."""
+        key = self.email_key(scope, email)
+        try:
+            async with manager.client.pipeline(transaction=True) as pipe:
+                pipe.zadd(key, {uuid.uuid4().hex: int(time.time() * 1000)})
+                pipe.expire(key, config.AUTH_RATE_LIMIT_WINDOW)
+                await pipe.execute()
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Rate limit failure count failed: {e}")
+
+    @staticmethod
+    def email_key(scope: str, email: str) -> str:
+        return f"ratelimit:{scope}:email:{email.strip().lower()}"
+
+
+auth_limiter = AuthRateLimiter()
@@ -1,6 +1,26 @@
+import time
+
 import redis.asyncio as redis
 
 from app.core.config import config
+from app.utils.metrics import REDIS_COMMAND_SECONDS
+
+
+class InstrumentedRedis(redis.Redis):
+    """Records the latency of every command (scripts included) for /metrics."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper(), outcome).observe(
+                time.perf_counter() - started
+            )
 
 
 class RedisManager:
@@ -8,7 +28,7 @@ class RedisManager:
         self.client: redis.Redis = None
 
     async def connect(self):
-        self.client = redis.from_url(
+        self.client = InstrumentedRedis.from_url(
             f"redis://{config.REDIS_HOST}:{config.REDIS_PORT}",
             decode_responses=True,
             max_connections=10,  # Cap connections
@@ -43,3 +63,11 @@ async def mark_reminder_sent(session_id: str, interval: int):
 async def is_reminder_sent(session_id: str, interval: int) -> bool:
     key = f"session:reminders:{session_id}"
     return await manager.client.sismember(key, interval)
+
+
+async def sent_reminders(reminders: list[tuple[str, int]]) -> list[bool]:
+    """is_reminder_sent for a batch of (session_id, interval) in one round trip."""
+    async with manager.client.pipeline(transaction=False) as pipe:
+        for session_id, interval in reminders:
+            pipe.sismember(f"session:reminders:{session_id}", interval)
+        return [bool(sent) for sent in await pipe.execute()]
@@ -1,15 +1,48 @@
 import asyncio
+import time
 from datetime import datetime, timedelta, timezone
 
-from app.utils.redis import is_reminder_sent, mark_reminder_sent
+from app.core.config import config
+from app.utils.leases import CLAIM_SCRIPT, REQUEUE_SCRIPT
+from app.utils.loader import Loaders
+from app.utils.redis import manager, mark_reminder_sent, sent_reminders
+from app.utils.session_lifecycle import transition_session
 from app.utils.telegram import send_telegram_msg
-from models.models import Car, ParkingLocation, ParkingSession, ParkingSessionStatus
+from models.models import ParkingSession, ParkingSessionStatus, SessionEventType, User
 
+# Sorted sets scored by unix timestamp. Members are "session_id:minutes_left:chat_id",
+# the chat empty for users without Telegram: they only get the expiry at 0.
+DUE_KEY = "reminders:due"
+PROCESSING_KEY = "reminders:processing"
 
-async def schedule_reminders(user_chat_id: str, end_time: datetime, session_id: str):
-    if end_time.tzinfo is None:
-        end_time = end_time.replace(tzinfo=timezone.utc)
+# Adds every reminder of a session at once, unless the session was already
+# scheduled (recovery on startup / other workers must not reschedule it).
+SCHEDULE_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 1])
+    redis.call('SADD', KEYS[2], ARGV[i + 1])
+end
+redis.call('EXPIREAT', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Drops the reminders of a session still waiting in the due set. The
+# scheduled marker stays, so a late retry of the session's start can't
+# schedule them again.
+CANCEL_SCRIPT = """
+local members = redis.call('SMEMBERS', KEYS[2])
+for _, member in ipairs(members) do
+    redis.call('ZREM', KEYS[1], member)
+end
+return #members
+"""
 
+
+def get_reminder_intervals(end_time: datetime) -> list[int]:
+    """Minutes before `end_time` at which a reminder is sent."""
     now = datetime.now(timezone.utc)
     total_duration = (end_time - now).total_seconds() / 60
 
@@ -20,42 +53,215 @@ async def schedule_reminders(user_chat_id: str, end_time: datetime, session_id:
     else:
         intervals = [int(total_duration * 0.5), int(total_duration * 0.2), 0]
 
-    intervals.sort(reverse=True)
+    return sorted({max(minutes_left, 0) for minutes_left in intervals}, reverse=True)
+
+
+async def schedule_reminders(
+    user_chat_id: str | None, end_time: datetime, session_id: str
+):
+    """
+    Stores the reminders of a session in Redis. Delivery is done by
+    the ReminderScheduler poller, so nothing sleeps in memory here.
+    """
+    if end_time.tzinfo is None:
+        end_time = end_time.replace(tzinfo=timezone.utc)
 
+    intervals = get_reminder_intervals(end_time) if user_chat_id else [0]
+    args = [int(end_time.timestamp()) + 86400]
     for minutes_left in intervals:
-        if await is_reminder_sent(session_id, minutes_left):
+        trigger_time = end_time - timedelta(minutes=minutes_left)
+        member = f"{session_id}:{minutes_left}:{user_chat_id or ''}"
+        args += [trigger_time.timestamp(), member]
+
+    script = manager.client.register_script(SCHEDULE_SCRIPT)
+    await script(keys=[DUE_KEY, f"session:reminders:scheduled:{session_id}"], args=args)
+
+
+async def cancel_reminders(session_id: str):
+    script = manager.client.register_script(CANCEL_SCRIPT)
+    await script(keys=[DUE_KEY, f"session:reminders:scheduled:{session_id}"])
+
+
+async def deliver_reminder(
+    session_id: str, minutes_left: int, user_chat_id: str, loaders: Loaders
+):
+    """Sends a reminder the scheduler found not sent yet; raises if it couldn't."""
+    session = await loaders.session.load(session_id)
+    if not session or session.status != ParkingSessionStatus.ACTIVE:
+        return
+
+    if minutes_left == 0:
+        # Expiry is a state change: the dispatcher sends its message
+        await transition_session(
+            session.id,
+            session.user_id,
+            ParkingSessionStatus.COMPLETED,
+            SessionEventType.EXPIRED,
+            ended_at=session.end_time,
+        )
+        await mark_reminder_sent(session_id, minutes_left)
+        return
+
+    if not user_chat_id:
+        return
+
+    car, parking_location = await asyncio.gather(
+        loaders.car.load(session.car_id),
+        loaders.location.load(session.parking_location_id),
+    )
+
+    car_plate = car.license_plate if car else "your car"
+    lat, lgn = session.car_location["coordinates"]
+    loc_name = parking_location.location_name if parking_location else f"{lat}, {lgn}"
+
+    msg = f"⚠️ <b>{minutes_left}m left!</b> at {loc_name} for your {car_plate} car!"
+
+    # Failures reach the scheduler, which leaves the reminder to be retried
+    await send_telegram_msg(user_chat_id, msg)
+    await mark_reminder_sent(session_id, minutes_left)
+
+
+async def _recover_batch(sessions: list[dict], semaphore: asyncio.Semaphore) -> int:
+    user_ids = list({session["user_id"] for session in sessions})
+    users = User.get_pymongo_collection().find(
+        {"_id": {"$in": user_ids}, "telegram_chat_id": {"$ne": None}},
+        {"telegram_chat_id": 1},
+    )
+    chat_ids = {user["_id"]: user["telegram_chat_id"] async for user in users}
+
+    async def schedule(session: dict):
+        async with semaphore:
+            await schedule_reminders(
+                chat_ids.get(session["user_id"]),
+                session["end_time"],
+                str(session["_id"]),
+            )
+
+    await asyncio.gather(*(schedule(session) for session in sessions))
+    return len(sessions)
+
+
+async def recover_active_sessions():
+    """
+    Makes sure every ACTIVE session has its reminders and expiry scheduled.
+    Sessions are streamed from a cursor in batches and their users are
+    resolved with one $in query per batch, so memory and query count
+    stay flat no matter how many sessions are active.
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(config.RECOVERY_CONCURRENCY)
+    scanned = recovered = 0
+
+    cursor = ParkingSession.get_pymongo_collection().find(
+        {"status": ParkingSessionStatus.ACTIVE.value},
+        {"user_id": 1, "end_time": 1},
+        batch_size=config.RECOVERY_BATCH_SIZE,
+    )
+
+    batch = []
+    async for session in cursor:
+        batch.append(session)
+        if len(batch) < config.RECOVERY_BATCH_SIZE:
             continue
 
-        trigger_time = end_time - timedelta(minutes=minutes_left)
-        delay = (trigger_time - datetime.now(timezone.utc)).total_seconds()
-        if delay > 0:
-            await asyncio.sleep(delay)
-        session = await ParkingSession.get(session_id)
-        if not session or session.status != ParkingSessionStatus.ACTIVE:
-            return
-
-        car = await Car.get(session.car_id)
-        parking_location = await ParkingLocation.get(session.parking_location_id)
-
-        car_plate = car.license_plate if car else "your car"
-        lat, lgn = session.car_location["coordinates"]
-        loc_name = (
-            parking_location.location_name if parking_location else f"{lat}, {lgn}"
+        scanned += len(batch)
+        recovered += await _recover_batch(batch, semaphore)
+        batch = []
+        print(
+            f"🚀 Recovering reminders: {recovered}/{scanned} sessions "
+            f"({time.perf_counter() - started:.1f}s)"
+        )
+
+    if batch:
+        scanned += len(batch)
+        recovered += await _recover_batch(batch, semaphore)
+
+    print(
+        f"🚀 Recovered reminders for {recovered}/{scanned} active sessions "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+class ReminderScheduler:
+    """
+    Drains due reminders from Redis. Every worker runs one poller; claims
+    are atomic, so workers share the load without double-sending.
+    """
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+
+    async def start(self):
+        self.claim = manager.client.register_script(CLAIM_SCRIPT)
+        self.requeue = manager.client.register_script(REQUEUE_SCRIPT)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        while True:
+            try:
+                claimed = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Reminder poll failed: {e}")
+                claimed = 0
+
+            # A full batch means there is probably more due work, so poll again right away
+            if claimed < config.REMINDER_BATCH_SIZE:
+                await asyncio.sleep(config.REMINDER_POLL_INTERVAL)
+
+    async def poll_once(self) -> int:
+        now = time.time()
+        keys = [DUE_KEY, PROCESSING_KEY]
+
+        await self.requeue(keys=keys, args=[now, config.REMINDER_BATCH_SIZE])
+        members = await self.claim(
+            keys=keys,
+            args=[now, config.REMINDER_BATCH_SIZE, now + config.REMINDER_LEASE_SECONDS],
         )
 
-        msg = (
-            f"🚨Your parking of {car_plate} at {loc_name} has expired!"
-            if minutes_left == 0
-            else f"⚠️ <b>{minutes_left}m left!</b> at {loc_name} for your {car_plate} car!"
+        reminders = []
+        for member in members:
+            try:
+                session_id, minutes_left, user_chat_id = member.split(":", 2)
+                reminders.append((member, session_id, int(minutes_left), user_chat_id))
+            except ValueError:
+                print(f"Dropping malformed reminder: {member}")
+                await manager.client.zrem(PROCESSING_KEY, member)
+
+        # The sent flags of the whole batch in one round trip, so every delivery
+        # starts with its session load in the same tick: one loader set then
+        # costs one query per collection for the whole batch
+        sent = await sent_reminders([(r[1], r[2]) for r in reminders])
+        loaders = Loaders()
+        await asyncio.gather(
+            *(
+                self.process(reminder, already_sent, loaders)
+                for reminder, already_sent in zip(reminders, sent)
+            )
         )
+        return len(members)
+
+    async def process(self, reminder: tuple, already_sent: bool, loaders: Loaders):
+        member, session_id, minutes_left, user_chat_id = reminder
+        if not already_sent:
+            try:
+                await deliver_reminder(session_id, minutes_left, user_chat_id, loaders)
+            except Exception as e:
+                # Left in the processing set, it is retried once the lease expires
+                print(f"Failed to deliver reminder {member}: {e}")
+                return
+
+        await manager.client.zrem(PROCESSING_KEY, member)
 
-        try:
-            await send_telegram_msg(user_chat_id, msg)
-            await mark_reminder_sent(session_id, minutes_left)
-        except Exception as e:
-            print(f"Failed to send telegram message: {e}")
-            # Continue execution to ensure session closes if needed
 
-        if minutes_left == 0:
-            session.status = ParkingSessionStatus.COMPLETED
-            await session.save()
+scheduler = ReminderScheduler()
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import math
+import time
+
+from app.core.config import config
+from app.utils.redis import manager
+
+# jti -> token exp. Entries are pruned once the token would have expired anyway.
+REVOKED_KEY = "auth:revoked"
+# user_id -> unix time; tokens issued before it are rejected
+WATERMARKS_KEY = "auth:watermarks"
+CHANNEL = "auth:revocations"
+
+# Drops watermarks older than ARGV[1] in one step, so a watermark set meanwhile
+# by revoke_user_tokens is never removed by mistake
+PRUNE_WATERMARKS_SCRIPT = """
+local entries = redis.call('HGETALL', KEYS[1])
+local removed = 0
+for i = 1, #entries, 2 do
+    if tonumber(entries[i + 1]) <= tonumber(ARGV[1]) then
+        redis.call('HDEL', KEYS[1], entries[i])
+        removed = removed + 1
+    end
+end
+return removed
+"""
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList:
+    """
+    Revoked token ids and per-user "issued before" watermarks live in Redis
+    and are mirrored in memory (a Bloom filter and a dict), kept current via
+    pub/sub plus a periodic reload. Checking a token only goes to Redis when
+    the Bloom filter reports a probable hit.
+    """
+
+    def __init__(self):
+        self.revoked = BloomFilter(
+            config.REVOCATION_BLOOM_CAPACITY, config.REVOCATION_BLOOM_ERROR_RATE
+        )
+        self.watermarks: dict[str, int] = {}
+        self.tasks: list[asyncio.Task] = []
+        self.stats = {"checks": 0, "bloom_hits": 0, "revoked": 0, "reloads": 0}
+
+    async def start(self):
+        try:
+            await self.reload()
+        except Exception as e:
+            print(f"Revocation list load failed: {e}")
+        self.tasks = [
+            asyncio.create_task(self.listen()),
+            asyncio.create_task(self.reload_periodically()),
+        ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def reload(self):
+        now = time.time()
+        # Older watermarks can no longer match a valid token
+        oldest = now - config.JWT_ACCESS_EXPIRE_DAYS * 86400
+
+        await manager.client.zremrangebyscore(REVOKED_KEY, "-inf", now)
+        prune = manager.client.register_script(PRUNE_WATERMARKS_SCRIPT)
+        await prune(keys=[WATERMARKS_KEY], args=[int(oldest)])
+        jtis = await manager.client.zrangebyscore(REVOKED_KEY, now, "+inf")
+        watermarks = await manager.client.hgetall(WATERMARKS_KEY)
+
+        revoked = BloomFilter(
+            config.REVOCATION_BLOOM_CAPACITY, config.REVOCATION_BLOOM_ERROR_RATE
+        )
+        for jti in jtis:
+            revoked.add(jti)
+
+        self.revoked = revoked
+        self.watermarks = {
+            user_id: int(issued_before)
+            for user_id, issued_before in watermarks.items()
+            if int(issued_before) > oldest
+        }
+        self.stats["reloads"] += 1
+
+    async def reload_periodically(self):
+        while True:
+            await asyncio.sleep(config.REVOCATION_RELOAD_INTERVAL)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"Revocation list reload failed: {e}")
+
+    async def listen(self):
+        while True:
+            try:
+                # Closed on every way out, so retries don't leak connections
+                async with manager.client.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    # Anything published while we were disconnected is picked up here
+                    await self.reload()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Revocation subscription failed: {e}")
+                await asyncio.sleep(1)
+
+    def apply(self, message: str):
+        kind, _, value = message.partition(":")
+        if kind == "jti":
+            self.revoked.add(value)
+        elif kind == "user":
+            user_id, _, issued_before = value.rpartition(":")
+            self.watermarks[user_id] = max(
+                self.watermarks.get(user_id, 0), int(issued_before)
+            )
+
+    async def revoke_token(self, jti: str, expires_at: float):
+        await manager.client.zadd(REVOKED_KEY, {jti: expires_at})
+        self.apply(f"jti:{jti}")
+        await manager.client.publish(CHANNEL, f"jti:{jti}")
+
+    async def revoke_user_tokens(self, user_id: str):
+        """Rejects every token of the user issued before now."""
+        issued_before = int(time.time())
+        await manager.client.hset(WATERMARKS_KEY, user_id, issued_before)
+        message = f"user:{user_id}:{issued_before}"
+        self.apply(message)
+        await manager.client.publish(CHANNEL, message)
+
+    async def is_revoked(self, payload: dict) -> bool:
+        self.stats["checks"] += 1
+
+        # iat has second precision, so a token issued in the same second survives
+        if payload.get("iat", 0) < self.watermarks.get(payload.get("id"), 0):
+            self.stats["revoked"] += 1
+            return True
+
+        jti = payload.get("jti")
+        if not jti or jti not in self.revoked:
+            return False
+
+        self.stats["bloom_hits"] += 1
+        try:
+            revoked = await manager.client.zscore(REVOKED_KEY, jti) is not None
+        except Exception as e:
+            # Bloom filters have no false negatives, so a hit is most likely real
+            print(f"Revocation check failed: {e}")
+            revoked = True
+
+        if revoked:
+            self.stats["revoked"] += 1
+        return revoked
+
+
+revocation = RevocationList()
@@ -0,0 +1,238 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
+
+from app.core.config import config
+from app.utils.loader import Loaders
+from app.utils.reminders import cancel_reminders, schedule_reminders
+from app.utils.session_lifecycle import events_recorded
+from app.utils.telegram import send_telegram_msg
+from models.models import (
+    ParkingSession,
+    ParkingSessionStatus,
+    SessionEvent,
+    SessionEventStatus,
+    SessionEventType,
+)
+
+
+async def describe(session: ParkingSession, loaders: Loaders) -> tuple[str, str]:
+    car, location = await asyncio.gather(
+        loaders.car.load(session.car_id),
+        loaders.location.load(session.parking_location_id),
+    )
+    car_plate = car.license_plate if car else "your car"
+    if location:
+        return car_plate, location.location_name
+    lng, lat = session.car_location["coordinates"]
+    return car_plate, f"{lat}, {lng}"
+
+
+async def on_started(
+    session: ParkingSession, chat_id: Optional[str], loaders: Loaders
+):
+    if session.status != ParkingSessionStatus.ACTIVE:
+        return
+
+    # Idempotent: a retried event finds the reminders already scheduled.
+    # Scheduled without a chat too, as the last one expires the session.
+    await schedule_reminders(chat_id, session.end_time, str(session.id))
+    if not chat_id:
+        return
+
+    car_plate, location_name = await describe(session, loaders)
+    minutes = round((session.end_time - session.start_time).total_seconds() / 60)
+    await send_telegram_msg(
+        chat_id,
+        f"Your parking session at '{location_name}' for {car_plate} that lasts {minutes} minutes has started.",
+    )
+
+
+async def on_ended(
+    session: ParkingSession, chat_id: Optional[str], loaders: Loaders, verb: str
+):
+    await cancel_reminders(str(session.id))
+    if not chat_id:
+        return
+    car_plate, location_name = await describe(session, loaders)
+    await send_telegram_msg(
+        chat_id, f"✅ Your parking of {car_plate} at {location_name} was {verb}."
+    )
+
+
+async def on_expired(
+    session: ParkingSession, chat_id: Optional[str], loaders: Loaders
+):
+    await cancel_reminders(str(session.id))
+    if not chat_id:
+        return
+    car_plate, location_name = await describe(session, loaders)
+    await send_telegram_msg(
+        chat_id, f"🚨Your parking of {car_plate} at {location_name} has expired!"
+    )
+
+
+HANDLERS = {
+    SessionEventType.STARTED.value: on_started,
+    SessionEventType.COMPLETED.value: partial(on_ended, verb="completed"),
+    SessionEventType.CANCELLED.value: partial(on_ended, verb="cancelled"),
+    SessionEventType.EXPIRED.value: on_expired,
+}
+
+
+class SessionEventDispatcher:
+    """
+    Drains the session_event outbox. Events are claimed in batches with a
+    lease (so several workers never handle the same one), handled, then
+    marked done; failures are retried with backoff. Side effects are
+    at-least-once: a handler may run again if a worker dies mid-event.
+    """
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        # Shared with session_lifecycle, which sets it after recording an event
+        self.wakeup = events_recorded
+        self.stats = {"dispatched": 0, "retried": 0, "failed": 0}
+
+    def wake(self):
+        """Polls right away instead of at the next interval (this worker only)."""
+        self.wakeup.set()
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            try:
+                claimed = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Session event poll failed: {e}")
+                claimed = 0
+
+            if claimed < config.SESSION_EVENT_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(
+                        self.wakeup.wait(), config.SESSION_EVENT_POLL_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def claim(self) -> list[dict]:
+        collection = SessionEvent.get_pymongo_collection()
+        now = datetime.utcnow()
+        due = {
+            "$or": [
+                {
+                    "status": SessionEventStatus.PENDING.value,
+                    "next_attempt_at": {"$lte": now},
+                },
+                # Claimed by a worker that died before finishing
+                {
+                    "status": SessionEventStatus.PROCESSING.value,
+                    "locked_until": {"$lte": now},
+                },
+            ]
+        }
+        candidates = collection.find(due, {"_id": 1}, limit=config.SESSION_EVENT_BATCH_SIZE)
+        event_ids = [event["_id"] async for event in candidates]
+        if not event_ids:
+            return []
+
+        # Re-checking `due` makes the claim atomic per event across workers
+        lease_id = uuid.uuid4().hex
+        lease = timedelta(seconds=config.SESSION_EVENT_LEASE_SECONDS)
+        await collection.update_many(
+            {"_id": {"$in": event_ids}, **due},
+            {
+                "$set": {
+                    "status": SessionEventStatus.PROCESSING.value,
+                    "locked_until": now + lease,
+                    "lease_id": lease_id,
+                }
+            },
+        )
+        claimed = collection.find({"_id": {"$in": event_ids}, "lease_id": lease_id})
+        return await claimed.to_list(length=None)
+
+    async def poll_once(self) -> int:
+        events = await self.claim()
+        # One loader set per batch: sessions, users, cars and locations cost one query each
+        loaders = Loaders()
+        await asyncio.gather(*(self.process(event, loaders) for event in events))
+        return len(events)
+
+    async def process(self, event: dict, loaders: Loaders):
+        try:
+            await self.handle(event, loaders)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.retry(event, e)
+            return
+
+        await self.finish(event, {"status": SessionEventStatus.DONE.value})
+        self.stats["dispatched"] += 1
+
+    async def handle(self, event: dict, loaders: Loaders):
+        session, user = await asyncio.gather(
+            loaders.session.load(event["session_id"]),
+            loaders.user.load(event["user_id"]),
+        )
+        if not session or not user:
+            return
+        # Handlers skip their Telegram messages for users without a chat
+        await HANDLERS[event["type"]](session, user.telegram_chat_id, loaders)
+
+    async def finish(self, event: dict, fields: dict, error: Optional[str] = None):
+        await SessionEvent.get_pymongo_collection().update_one(
+            {"_id": event["_id"], "lease_id": event["lease_id"]},
+            {
+                "$set": {**fields, "processed_at": datetime.utcnow(), "last_error": error},
+                "$unset": {"locked_until": "", "lease_id": ""},
+            },
+        )
+
+    async def retry(self, event: dict, error: Exception):
+        attempts = event.get("attempts", 0) + 1
+        if attempts >= config.SESSION_EVENT_MAX_ATTEMPTS:
+            print(f"Giving up on session event {event['_id']} ({event['type']}): {error}")
+            await self.finish(
+                event,
+                {"status": SessionEventStatus.FAILED.value, "attempts": attempts},
+                str(error),
+            )
+            self.stats["failed"] += 1
+            return
+
+        delay = config.SESSION_EVENT_RETRY_DELAY * 2 ** (attempts - 1)
+        print(f"Session event {event['_id']} ({event['type']}) failed ({error}), retrying in {delay}s")
+        await SessionEvent.get_pymongo_collection().update_one(
+            {"_id": event["_id"], "lease_id": event["lease_id"]},
+            {
+                "$set": {
+                    "status": SessionEventStatus.PENDING.value,
+                    "attempts": attempts,
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay),
+                    "last_error": str(error),
+                },
+                "$unset": {"locked_until": "", "lease_id": ""},
+            },
+        )
+        self.stats["retried"] += 1
+
+
+event_dispatcher = SessionEventDispatcher()
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime
+
+from beanie import PydanticObjectId
+
+from app.core.database import transaction
+from models.models import (
+    ParkingSession,
+    ParkingSessionStatus,
+    SessionEvent,
+    SessionEventType,
+)
+
+# Set when an event is recorded, so this worker's dispatcher polls right away
+events_recorded = asyncio.Event()
+
+
+async def record_event(
+    session_id: PydanticObjectId,
+    user_id: PydanticObjectId,
+    event_type: SessionEventType,
+    db_session=None,
+):
+    await SessionEvent(session_id=session_id, user_id=user_id, type=event_type).insert(
+        session=db_session
+    )
+
+
+async def start_session(session: ParkingSession):
+    """
+    Inserts a new session with its STARTED event in one transaction. Without
+    transactions a failed event insert deletes the session again, so a
+    retried request doesn't leave a duplicate behind.
+    """
+    async with transaction() as db_session:
+        await session.insert(session=db_session)
+        try:
+            await record_event(
+                session.id, session.user_id, SessionEventType.STARTED, db_session
+            )
+        except Exception:
+            if db_session is None:
+                await session.delete()
+            raise
+
+    events_recorded.set()
+
+
+async def transition_session(
+    session_id: PydanticObjectId,
+    user_id: PydanticObjectId,
+    status: ParkingSessionStatus,
+    event_type: SessionEventType,
+    ended_at: datetime,
+) -> bool:
+    """
+    Ends an ACTIVE session and records its event in the same transaction
+    (without transactions a failed event insert reopens the session). False
+    when the session had already ended (nothing is recorded then).
+    """
+    collection = ParkingSession.get_pymongo_collection()
+    async with transaction() as db_session:
+        result = await collection.update_one(
+            {"_id": session_id, "status": ParkingSessionStatus.ACTIVE.value},
+            {"$set": {"status": status.value, "actual_end_time": ended_at}},
+            session=db_session,
+        )
+        if not result.modified_count:
+            return False
+
+        try:
+            await record_event(session_id, user_id, event_type, db_session)
+        except Exception:
+            if db_session is None:
+                await collection.update_one(
+                    {"_id": session_id, "status": status.value},
+                    {
+                        "$set": {"status": ParkingSessionStatus.ACTIVE.value},
+                        "$unset": {"actual_end_time": ""},
+                    },
+                )
+            raise
+
+    events_recorded.set()
+    return True
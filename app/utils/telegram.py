@@ -1,10 +1,250 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
 import httpx
 
 from app.core.config import config
+from app.utils.cache import TTLCache
+
+
+class TelegramError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """How long until a token is available, without taking it."""
+        self.refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> float:
+        """Takes a token, returns how long to wait first (0 if one was available)."""
+        self.refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Makes the next take() wait at least `seconds` (Telegram's retry_after)."""
+        self.refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: str
+    text: str
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+class TelegramClient:
+    """
+    Long-lived Telegram sender. Messages go through a bounded queue drained
+    by a few workers sharing one pooled HTTP client, throttled by a global
+    and a per-chat token bucket. A message whose chat is held back (its
+    bucket, a 429's retry_after, a retry backoff) is put back on the queue
+    for later instead of keeping a worker asleep, so one throttled chat
+    never delays the others. Every message gets at most
+    TELEGRAM_MAX_RETRIES attempts.
+    """
+
+    def __init__(self):
+        self.http: httpx.AsyncClient | None = None
+        self.queue: asyncio.Queue[OutgoingMessage] = asyncio.Queue(
+            maxsize=config.TELEGRAM_MAX_QUEUE
+        )
+        self.workers: list[asyncio.Task] = []
+        # Messages waiting to be requeued, by id(message)
+        self.deferred: dict[int, tuple[asyncio.TimerHandle, OutgoingMessage]] = {}
+        self.global_bucket = TokenBucket(
+            config.TELEGRAM_GLOBAL_RATE, config.TELEGRAM_GLOBAL_RATE
+        )
+        self.chat_buckets = TTLCache(maxsize=100_000, ttl=60)
+        self.stats = {
+            "sent": 0,
+            "failed": 0,
+            "rejected": 0,
+            "rate_limited": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() + len(self.deferred)
+
+    async def start(self):
+        if self.http:
+            return
+
+        self.http = httpx.AsyncClient(
+            base_url=f"{config.TELEGRAM_API_URL}/bot{config.TELEGRAM_BOT_TOKEN}",
+            timeout=10,
+            limits=httpx.Limits(
+                max_connections=config.TELEGRAM_WORKERS,
+                max_keepalive_connections=config.TELEGRAM_WORKERS,
+            ),
+        )
+        self.workers = [
+            asyncio.create_task(self.worker()) for _ in range(config.TELEGRAM_WORKERS)
+        ]
+
+    async def stop(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+        pending = [message for _, message in self.deferred.values()]
+        for handle, _ in self.deferred.values():
+            handle.cancel()
+        self.deferred = {}
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for message in pending:
+            if not message.future.done():
+                message.future.set_exception(TelegramError("Telegram client stopped"))
+
+        if self.http:
+            await self.http.aclose()
+            self.http = None
+
+    async def send(self, chat_id: str, text: str):
+        if not self.http:
+            await self.start()
+
+        message = OutgoingMessage(
+            chat_id=str(chat_id),
+            text=text,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Callers (reminders, session events) retry later instead of piling up here
+            self.stats["rejected"] += 1
+            raise TelegramError("Telegram queue is full")
+        return await message.future
+
+    def chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(config.TELEGRAM_CHAT_RATE, 1)
+            self.chat_buckets.set(chat_id, bucket)
+        return bucket
+
+    def defer(self, message: OutgoingMessage, delay: float):
+        """Puts the message back on the queue after `delay`, without holding a worker."""
+        handle = asyncio.get_running_loop().call_later(delay, self.requeue, message)
+        self.deferred[id(message)] = (handle, message)
+
+    def requeue(self, message: OutgoingMessage):
+        del self.deferred[id(message)]
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.fail(message, TelegramError("Telegram queue is full"))
+
+    async def worker(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.deliver(message)
+            finally:
+                self.queue.task_done()
+
+    async def deliver(self, message: OutgoingMessage):
+        chat_bucket = self.chat_bucket(message.chat_id)
+        delay = chat_bucket.wait_time()
+        if delay > 0:
+            self.defer(message, delay)
+            return
+
+        # The global limit applies to every message alike, so waiting here is fair
+        chat_bucket.take()
+        delay = self.global_bucket.take()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        message.attempts += 1
+        try:
+            result = await self.post(message)
+        except TelegramError as e:
+            self.fail(message, e)
+            return
+        except Exception as e:
+            if message.attempts >= config.TELEGRAM_MAX_RETRIES:
+                self.fail(message, e)
+            else:
+                self.defer(message, 2**message.attempts)
+            return
+
+        if result is None:
+            if message.attempts >= config.TELEGRAM_MAX_RETRIES:
+                self.fail(message, TelegramError("Telegram kept rate limiting the chat"))
+            else:
+                # post() paused the chat's bucket for retry_after
+                self.defer(message, self.chat_bucket(message.chat_id).wait_time())
+            return
+
+        latency = time.monotonic() - message.queued_at
+        self.stats["sent"] += 1
+        self.stats["latency_total"] += latency
+        self.stats["latency_max"] = max(self.stats["latency_max"], latency)
+        if not message.future.done():
+            message.future.set_result(result)
+
+    async def post(self, message: OutgoingMessage) -> dict | None:
+        """Returns the API result, or None when the message has to be retried."""
+        response = await self.http.post(
+            "/sendMessage",
+            json={"chat_id": message.chat_id, "text": message.text, "parse_mode": "HTML"},
+        )
+
+        if response.status_code == 429:
+            self.stats["rate_limited"] += 1
+            retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+            # Only this chat backs off: the global bucket already keeps the bot under its limit
+            bucket = self.chat_bucket(message.chat_id)
+            bucket.pause(retry_after)
+            self.chat_buckets.set(message.chat_id, bucket, ttl=retry_after + 60)
+            return None
+
+        if response.status_code >= 500:
+            raise httpx.HTTPStatusError(
+                f"Telegram returned {response.status_code}",
+                request=response.request,
+                response=response,
+            )
+
+        body = response.json()
+        if not body.get("ok"):
+            raise TelegramError(body.get("description", "Telegram request failed"))
+        return body["result"]
+
+    def fail(self, message: OutgoingMessage, error: Exception):
+        self.stats["failed"] += 1
+        if not message.future.done():
+            message.future.set_exception(error)
+
+
+telegram = TelegramClient()
 
 
 async def send_telegram_msg(chat_id: str, text: str):
-    url = f"https://api.telegram.org/bot{config.TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
-    async with httpx.AsyncClient() as client:
-        await client.post(url, json=payload)
+    return await telegram.send(chat_id, text)
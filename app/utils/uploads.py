@@ -0,0 +1,42 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.core.config import config
+
+TOO_LARGE = "Request body is too large"
+
+
+class UploadLimitMiddleware:
+    """
+    Pure ASGI middleware capping request bodies at UPLOAD_MAX_BYTES. A
+    declared Content-Length over the limit is rejected before anything is
+    read; otherwise bytes are counted as they stream in (Starlette spools
+    multipart files to disk) and the read fails with 413 past the limit.
+    """
+
+    def __init__(self, app, max_bytes: int | None = None):
+        self.app = app
+        self.max_bytes = max_bytes or config.UPLOAD_MAX_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": TOO_LARGE}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Surfaces from the body parsing in the route as a 413 response
+                    raise HTTPException(status_code=413, detail=TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
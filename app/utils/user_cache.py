@@ -0,0 +1,115 @@
+import asyncio
+import json
+from typing import Optional
+
+from app.core.config import config
+from app.utils.cache import TTLCache
+from app.utils.redis import manager
+
+CHANNEL = "user:cache:invalidations"
+
+
+class UserCache:
+    """
+    Two-tier cache of serialized User documents keyed by id: an in-process
+    LRU in front of an optional Redis tier. Entries never hold the password
+    hash. Saving a user drops its entries everywhere: from Redis, and from
+    every worker's LRU through pub/sub.
+    """
+
+    def __init__(self):
+        self.local = TTLCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+        self.task: asyncio.Task | None = None
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"user:cache:{user_id}"
+
+    @staticmethod
+    def _redis_enabled() -> bool:
+        return config.USER_CACHE_REDIS and manager.client is not None
+
+    async def start(self):
+        self.task = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def listen(self):
+        while True:
+            try:
+                async with manager.client.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    # Invalidations published while we were disconnected are lost
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.local.pop(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"User cache subscription failed: {e}")
+                await asyncio.sleep(1)
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        data = self.local.get(user_id)
+        if data is not None:
+            self.stats["local_hits"] += 1
+            return data
+
+        if not self._redis_enabled():
+            self.stats["misses"] += 1
+            return None
+
+        try:
+            raw = await manager.client.get(self._key(user_id))
+        except Exception as e:
+            print(f"User cache read failed: {e}")
+            return None
+
+        if not raw:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["redis_hits"] += 1
+        data = json.loads(raw)
+        self.local.set(user_id, data)
+        return data
+
+    async def set(self, user_id: str, data: dict):
+        data = {field: value for field, value in data.items() if field != "password"}
+        self.local.set(user_id, data)
+
+        if not self._redis_enabled():
+            return
+
+        try:
+            await manager.client.set(
+                self._key(user_id), json.dumps(data), ex=config.USER_CACHE_REDIS_TTL
+            )
+        except Exception as e:
+            print(f"User cache write failed: {e}")
+
+    async def invalidate(self, user_id: str):
+        self.local.pop(user_id)
+        self.stats["invalidations"] += 1
+
+        if manager.client is None:
+            return
+
+        try:
+            if self._redis_enabled():
+                await manager.client.delete(self._key(user_id))
+            await manager.client.publish(CHANNEL, user_id)
+        except Exception as e:
+            print(f"User cache invalidation failed: {e}")
+
+
+user_cache = UserCache()
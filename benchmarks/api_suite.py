@@ -0,0 +1,322 @@
+"""
+Throughput and latency of the hot endpoints, driving app.main:app through
+httpx's in-process ASGI transport. Mongo is a throwaway database on a local
+mongod; Redis is fakeredis (pip install "fakeredis[lua]"), so results
+reflect the application and the database, not the network.
+
+Scenarios: signin, an authenticated read (GET /car), GET /parking/proximity,
+POST /session with a photo and GET /session. Each reports req/s and
+p50/p95/p99; results are written to JSON so runs can be compared.
+
+    DATABASE_URL=mongodb://localhost:27017/ \\
+        python -m benchmarks.api_suite --requests 500 --output after.json
+    python -m benchmarks.api_suite --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import httpx
+from PIL import Image
+
+from app.core.config import config
+from benchmarks._common import git_commit, percentile
+
+CITY = (51.5074, -0.1278)
+PASSWORD = "correct horse battery"
+USERS = 50
+CARS_PER_USER = 2
+LOCATIONS = 2000
+SAVED_PER_USER = 20
+SESSIONS_PER_USER = 200
+# Argon2 dominates signin, so it runs a fraction of the requests
+SIGNIN_SHARE = 0.2
+
+
+def jitter(lat: float, lng: float, spread: float = 0.05) -> tuple[float, float]:
+    return lat + random.uniform(-spread, spread), lng + random.uniform(-spread, spread)
+
+
+def load_app(database: str):
+    """Imports the app against the benchmark database, inside a temp dir for photos."""
+    config.DATABASE_NAME = database
+    # The limiter would otherwise reject the benchmark's own traffic
+    config.AUTH_RATE_LIMIT_IP = config.AUTH_RATE_LIMIT_EMAIL = 10**9
+    os.chdir(tempfile.mkdtemp(prefix="parkomat-bench-"))
+
+    import fakeredis
+
+    from app.utils.redis import manager
+
+    manager.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    import app.main
+
+    return app.main
+
+
+async def seed(main) -> list[dict]:
+    from beanie import init_beanie
+
+    from app.core.jwt import fast_jwt
+    from app.core.password_utils import pwd_context
+    from models.models import (
+        Car,
+        ParkingLocation,
+        ParkingSession,
+        ParkingSessionStatus,
+        User,
+        UserParkingLocation,
+    )
+
+    await main.db.client.drop_database(config.DATABASE_NAME)
+    await init_beanie(database=main.db, document_models=main.DOCUMENT_MODELS)
+
+    hashed = pwd_context.hash(PASSWORD)
+    users = [
+        User(email=f"bench{i}@example.com", password=hashed, email_verified=True)
+        for i in range(USERS)
+    ]
+    await User.insert_many(users)
+    users = await User.find_all().to_list()
+
+    cars = [
+        Car(user_id=user.id, license_plate=f"BN{i:02d}{j}CAR")
+        for i, user in enumerate(users)
+        for j in range(CARS_PER_USER)
+    ]
+    await Car.insert_many(cars)
+    cars = await Car.find_all().to_list()
+
+    locations = []
+    for i in range(LOCATIONS):
+        lat, lng = jitter(*CITY)
+        locations.append(
+            ParkingLocation(
+                owner_user_id=random.choice(users).id,
+                location_name=f"Bench spot {i}",
+                geo_point={"type": "Point", "coordinates": [lng, lat]},
+                latitude=lat,
+                longitude=lng,
+                max_stay=120,
+                is_public=i % 2 == 0,
+            )
+        )
+    await ParkingLocation.insert_many(locations)
+    locations = await ParkingLocation.find_all().to_list()
+
+    memberships, sessions = [], []
+    now = datetime.now(timezone.utc)
+    for user in users:
+        for location in random.sample(locations, SAVED_PER_USER):
+            memberships.append(
+                UserParkingLocation(user_id=user.id, parking_location_id=location.id)
+            )
+        user_cars = [car for car in cars if car.user_id == user.id]
+        for i in range(SESSIONS_PER_USER):
+            location = random.choice(locations)
+            started = now - timedelta(hours=3 * (i + 1))
+            sessions.append(
+                ParkingSession(
+                    user_id=user.id,
+                    car_id=random.choice(user_cars).id,
+                    parking_location_id=location.id,
+                    car_location=location.geo_point,
+                    start_time=started,
+                    end_time=started + timedelta(hours=2),
+                    actual_end_time=started + timedelta(hours=2),
+                    status=ParkingSessionStatus.COMPLETED,
+                )
+            )
+    await UserParkingLocation.insert_many(memberships)
+    await ParkingSession.insert_many(sessions)
+
+    return [
+        {
+            "email": user.email,
+            "token": await fast_jwt.encode_access(
+                data={"id": str(user.id), "email": user.email}
+            ),
+            "car_id": str(next(car.id for car in cars if car.user_id == user.id)),
+        }
+        for user in users
+    ]
+
+
+def jpeg_photo() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (1600, 1200), "gray").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def build_scenarios(accounts: list[dict]) -> dict:
+    photo = jpeg_photo()
+
+    def auth(account: dict) -> dict:
+        return {"Authorization": f"Bearer {account['token']}"}
+
+    async def signin(client, account):
+        return await client.post(
+            "/api/public/auth/signin",
+            json={"email": account["email"], "password": PASSWORD},
+        )
+
+    async def cars(client, account):
+        return await client.get("/api/private/car", headers=auth(account))
+
+    async def proximity(client, account):
+        lat, lng = jitter(*CITY)
+        return await client.get(
+            "/api/private/parking/proximity",
+            params={"lat": lat, "lng": lng},
+            headers=auth(account),
+        )
+
+    async def create_session(client, account):
+        lat, lng = jitter(*CITY)
+        return await client.post(
+            "/api/private/session",
+            data={
+                "car_id": account["car_id"],
+                "lat": lat,
+                "lng": lng,
+                "manual_max_stay_mins": 60,
+            },
+            files={"photo": ("proof.jpg", photo, "image/jpeg")},
+            headers=auth(account),
+        )
+
+    async def list_sessions(client, account):
+        return await client.get(
+            "/api/private/session", params={"limit": 50}, headers=auth(account)
+        )
+
+    return {
+        "signin": signin,
+        "cars": cars,
+        "proximity": proximity,
+        "create_session": create_session,
+        "list_sessions": list_sessions,
+    }
+
+
+async def run_scenario(client, scenario, accounts, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await scenario(client, accounts[i % len(accounts)])
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "status_codes": {str(status): count for status, count in statuses.items()},
+        "req_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def main(args):
+    output = os.path.abspath(args.output)
+    commit = git_commit()
+    main_module = load_app(args.database)
+
+    from app.core.password_utils import password_hasher
+    from app.utils.images import image_processor
+
+    password_hasher.start()
+    image_processor.start()
+
+    print(f"Seeding {args.database}...")
+    accounts = await seed(main_module)
+    scenarios = build_scenarios(accounts)
+
+    results = {}
+    transport = httpx.ASGITransport(app=main_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in args.scenarios or scenarios:
+            requests = args.requests
+            if name == "signin":
+                requests = max(1, int(requests * SIGNIN_SHARE))
+
+            await run_scenario(client, scenarios[name], accounts, args.warmup, 4)
+            client.cookies.clear()
+            results[name] = await run_scenario(
+                client, scenarios[name], accounts, requests, args.concurrency
+            )
+            # signin sets a cookie, which login_required would prefer over the Bearer token
+            client.cookies.clear()
+            result = results[name]
+            print(
+                f"{name:>15}: {result['req_per_s']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:7.2f}ms  p95 {result['p95_ms']:7.2f}ms  "
+                f"p99 {result['p99_ms']:7.2f}ms  errors {result['errors']}"
+            )
+
+    await main_module.db.client.drop_database(args.database)
+    password_hasher.stop()
+    image_processor.stop()
+
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+def compare(base_path: str, new_path: str):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{base.get('commit')} -> {new.get('commit')}")
+    for name, result in new["results"].items():
+        before = base["results"].get(name)
+        if not before:
+            continue
+        throughput = (result["req_per_s"] / before["req_per_s"] - 1) * 100
+        p99 = (result["p99_ms"] / before["p99_ms"] - 1) * 100
+        print(f"{name:>15}: req/s {throughput:+6.1f}%  p99 {p99:+6.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--database", default="parkomat_bench")
+    parser.add_argument("--scenarios", nargs="*")
+    parser.add_argument("--output", default="api_suite.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(main(args))
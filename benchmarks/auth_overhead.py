@@ -0,0 +1,39 @@
+"""
+Per-request cost of authenticating a repeat access token: a fresh FastJWT()
+plus full jwt.decode (previous behaviour) against the shared fast_jwt
+instance with its verified-claims cache.
+
+    python -m benchmarks.auth_overhead --requests 50000
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.jwt import FastJWT, fast_jwt
+
+
+async def bench(decode, token: str, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await decode(token)
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def main(requests: int):
+    token = await fast_jwt.encode_access(data={"id": "0" * 24, "email": "a@b.c"})
+
+    async def uncached(token: str):
+        return FastJWT()._decode(token, fast_jwt.access_secret)
+
+    old = await bench(uncached, token, requests)
+    new = await bench(fast_jwt.decode_access, token, requests)
+    print(f"fresh FastJWT + jwt.decode: {old:.2f}us/request")
+    print(f"fast_jwt.decode_access:     {new:.2f}us/request ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
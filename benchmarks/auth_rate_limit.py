@@ -0,0 +1,122 @@
+"""
+Signin latency of legitimate users while one IP floods signin with
+guessed passwords, with and without app.utils.rate_limit in front of the
+Argon2 check. Needs the Redis from REDIS_HOST/REDIS_PORT.
+
+The signin route here only runs the limiter and the password check, which
+is where signin spends its CPU; it is served in-process through httpx's
+ASGI transport, one transport (client address) per simulated IP.
+
+    python -m benchmarks.auth_rate_limit --duration 10 --attackers 64
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+
+from app.core.password_utils import password_hasher, pwd_context
+from app.utils.rate_limit import auth_limiter
+from app.utils.redis import close_redis, init_redis, manager
+from benchmarks._common import percentile
+
+PASSWORD = "correct horse battery"
+
+
+class Credentials(BaseModel):
+    email: str
+    password: str
+
+
+def build_app(limited: bool, hashed: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/signin")
+    async def signin(payload: Credentials, request: Request):
+        if limited:
+            await auth_limiter.check(request, "bench-signin", payload.email)
+        valid, _ = await password_hasher.verify(payload.password, hashed)
+        if not valid:
+            if limited:
+                await auth_limiter.record_failure("bench-signin", payload.email)
+            raise HTTPException(status_code=401, detail="Bad email or password")
+        return {"ok": True}
+
+    return app
+
+
+def client_for(app: FastAPI, ip: str) -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=app, client=(ip, 40000))
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+async def attacker(app: FastAPI, deadline: float, counts: dict):
+    async with client_for(app, "10.66.0.1") as client:
+        attempt = 0
+        while time.perf_counter() < deadline:
+            attempt += 1
+            response = await client.post(
+                "/signin",
+                json={"email": f"victim{attempt % 1000}@example.com", "password": "guess123"},
+            )
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+            # A rejected request may never suspend, let the other clients in
+            await asyncio.sleep(0)
+
+
+async def legit_user(app: FastAPI, user: int, deadline: float, latencies: list):
+    async with client_for(app, f"192.168.1.{user}") as client:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post(
+                "/signin", json={"email": f"user{user}@example.com", "password": PASSWORD}
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(2)
+
+
+async def run(limited: bool, hashed: str, duration: float, attackers: int, users: int):
+    app = build_app(limited, hashed)
+    deadline = time.perf_counter() + duration
+    latencies, counts = [], {}
+
+    await asyncio.gather(
+        *(attacker(app, deadline, counts) for _ in range(attackers)),
+        *(legit_user(app, user, deadline, latencies) for user in range(1, users + 1)),
+    )
+
+    name = "limited" if limited else "unlimited"
+    print(
+        f"{name:>9}: legit signins {len(latencies)}, "
+        f"p50 {percentile(latencies, 50) * 1000:.0f}ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.0f}ms, attacker responses {counts}"
+    )
+
+
+async def main(duration: float, attackers: int, users: int):
+    if manager.client is None:
+        await init_redis()
+    await manager.client.delete(
+        *[key async for key in manager.client.scan_iter("ratelimit:bench-signin:*")], "_"
+    )
+    hashed = pwd_context.hash(PASSWORD)
+    password_hasher.start()
+
+    await run(False, hashed, duration, attackers, users)
+    await run(True, hashed, duration, attackers, users)
+
+    password_hasher.stop()
+    await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--attackers", type=int, default=64)
+    parser.add_argument("--users", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.duration, args.attackers, args.users))
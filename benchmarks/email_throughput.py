@@ -0,0 +1,111 @@
+"""
+Messages/sec against a local aiosmtpd server: one aiosmtplib.send per
+message (previous behaviour), the pooled connections in app.core.email,
+and optionally the whole Redis outbox (needs REDIS_HOST/REDIS_PORT).
+aiosmtpd comes with the dev dependencies.
+
+    python -m benchmarks.email_throughput --messages 500 --outbox
+"""
+
+import argparse
+import asyncio
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from app.core.config import config
+from app.core.email import TEMPLATES, send_template, smtp_pool
+
+HOST, PORT = "127.0.0.1", 8025
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def configure_smtp():
+    config.ENV = "local"
+    config.SMTP_HOST, config.SMTP_PORT = HOST, PORT
+    config.SMTP_USER = config.SMTP_PASSWORD = "bench"
+    config.SMTP_SENDER = "bench@parkomat.local"
+
+
+async def send_unpooled(to: str):
+    subject, body = TEMPLATES["signin_alert"].render()
+    message = EmailMessage()
+    message["From"] = config.SMTP_SENDER
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    await aiosmtplib.send(message, hostname=HOST, port=PORT, timeout=10)
+
+
+async def send_pooled(to: str):
+    await send_template(to, "signin_alert", {})
+
+
+async def bench(send, messages: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await send(f"user{i}@example.com")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    return messages / (time.perf_counter() - started)
+
+
+async def bench_outbox(messages: int, handler: CountingHandler) -> float:
+    from app.utils.email_outbox import email_outbox
+    from app.utils.redis import close_redis, init_redis
+
+    await init_redis()
+    await email_outbox.start()
+
+    received = handler.received
+    started = time.perf_counter()
+    for i in range(messages):
+        await email_outbox.enqueue(f"user{i}@example.com", "signin_alert")
+    while handler.received - received < messages:
+        await asyncio.sleep(0.01)
+    rate = messages / (time.perf_counter() - started)
+
+    await email_outbox.stop()
+    await close_redis()
+    return rate
+
+
+async def main(messages: int, concurrency: int, outbox: bool):
+    configure_smtp()
+    handler = CountingHandler()
+    controller = Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+
+    try:
+        old = await bench(send_unpooled, messages, concurrency)
+        print(f"connection per message: {old:.0f} msg/s")
+        new = await bench(send_pooled, messages, concurrency)
+        print(f"pooled connections:     {new:.0f} msg/s ({new / old:.1f}x), {smtp_pool.stats}")
+        if outbox:
+            rate = await bench_outbox(messages, handler)
+            print(f"outbox end to end:      {rate:.0f} msg/s")
+    finally:
+        await smtp_pool.close()
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--outbox", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.concurrency, args.outbox))
@@ -0,0 +1,301 @@
+"""
+Bulk-loads a synthetic, production-shaped dataset into a local mongod:
+users with cars, parking locations clustered around cities, skewed
+memberships (a few heavy users save hundreds of spots, most save a few)
+and a long session history, also skewed towards heavy users and popular
+spots. Documents are raw dicts inserted with insert_many(ordered=False),
+several batches in flight; the models' indexes are built afterwards.
+
+    DATABASE_URL=mongodb://localhost:27017/ \\
+        python -m benchmarks.generate_dataset --locations 2000000 \\
+            --sessions 20000000 --database parkomat_scale
+
+Datasets can be grown in steps (see benchmarks.geo_scale): each call to
+DatasetGenerator.grow() only inserts what is missing to reach the targets.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+import motor.motor_asyncio
+from beanie import PydanticObjectId, init_beanie
+from pymongo.errors import BulkWriteError
+
+from app.core.config import config
+from models.models import Car, ParkingLocation, ParkingSession, User, UserParkingLocation
+
+# (lat, lng, weight, spread in km): big cities get more spots, spread wider
+CITIES = [
+    (51.5074, -0.1278, 10, 12),
+    (48.8566, 2.3522, 8, 10),
+    (52.5200, 13.4050, 6, 10),
+    (40.4168, -3.7038, 5, 8),
+    (41.9028, 12.4964, 4, 8),
+    (50.4501, 30.5234, 4, 8),
+    (53.4808, -2.2426, 3, 6),
+    (52.3676, 4.9041, 3, 5),
+    (50.0755, 14.4378, 2, 5),
+    (55.9533, -3.1883, 1, 4),
+]
+PUBLIC_SHARE = 0.3
+INACTIVE_SHARE = 0.05
+MANUAL_SESSION_SHARE = 0.05
+MAX_STAYS = [30, 60, 120, 180, 240, None]
+HISTORY_DAYS = 365
+DOCUMENT_MODELS = [User, Car, ParkingLocation, UserParkingLocation, ParkingSession]
+
+
+def city_point(rng: random.Random) -> tuple[float, float]:
+    lat, lng, _, spread = rng.choices(CITIES, weights=[c[2] for c in CITIES])[0]
+    lat += rng.gauss(0, spread / 111)
+    lng += rng.gauss(0, spread / (111 * math.cos(math.radians(lat))))
+    return lat, lng
+
+
+def skewed_index(rng: random.Random, size: int, skew: float) -> int:
+    """Power-law pick from range(size): low indices are the popular ones."""
+    return min(size - 1, int(size * rng.random() ** skew))
+
+
+def membership_count(rng: random.Random, cap: int) -> int:
+    """Pareto-distributed: most users save a handful of spots, some hundreds."""
+    return min(cap, int(rng.paretovariate(1.2)) + 1)
+
+
+class DatasetGenerator:
+    """Keeps the generated ids in memory, so the dataset can be grown."""
+
+    def __init__(self, db, seed: int = 0, batch_size: int = 10_000, in_flight: int = 4):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.in_flight = in_flight
+        self.now = datetime.utcnow()
+
+        self.users: list[PydanticObjectId] = []
+        self.cars: dict[PydanticObjectId, list[PydanticObjectId]] = {}
+        self.locations: list[PydanticObjectId] = []
+        self.coordinates: dict[PydanticObjectId, tuple[float, float]] = {}
+        self.owners: dict[PydanticObjectId, PydanticObjectId] = {}
+        # Saved location ids per user, as a list (to pick from) and a set (to dedupe)
+        self.saved: dict[PydanticObjectId, list] = {}
+        self.saved_sets: dict[PydanticObjectId, set] = {}
+        self.memberships = 0
+        self.sessions = 0
+
+    async def insert(self, collection: str, documents) -> int:
+        """Streams documents in concurrent unordered batches, returns how many landed."""
+
+        async def flush(batch: list[dict]) -> int:
+            try:
+                result = await self.db[collection].insert_many(batch, ordered=False)
+                return len(result.inserted_ids)
+            except BulkWriteError as e:
+                # Duplicates are skipped, the rest of the batch still lands
+                return e.details["nInserted"]
+
+        inserted, pending, batch = 0, set(), []
+        for document in documents:
+            batch.append(document)
+            if len(batch) < self.batch_size:
+                continue
+            pending.add(asyncio.create_task(flush(batch)))
+            batch = []
+            # Backpressure, so a huge load isn't buffered in memory
+            if len(pending) >= self.in_flight:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                inserted += sum(task.result() for task in done)
+        if batch:
+            pending.add(asyncio.create_task(flush(batch)))
+        return inserted + sum(await asyncio.gather(*pending))
+
+    def save(self, user_id: PydanticObjectId, location_id: PydanticObjectId):
+        saved = self.saved_sets.setdefault(user_id, set())
+        if location_id in saved:
+            return None
+        saved.add(location_id)
+        self.saved.setdefault(user_id, []).append(location_id)
+        return {"user_id": user_id, "parking_location_id": location_id}
+
+    def generate_users(self, count: int):
+        for _ in range(count):
+            user_id = PydanticObjectId()
+            i = len(self.users)
+            self.users.append(user_id)
+            self.cars[user_id] = []
+            yield {
+                "_id": user_id,
+                "email": f"scale{i}@example.com",
+                "password": "not-a-real-hash",
+                "email_verified": True,
+                "notification_settings": {
+                    "email_on_signin": False,
+                    "email_on_password_reset": False,
+                },
+                "created_at": self.now - timedelta(days=self.rng.randrange(HISTORY_DAYS)),
+            }
+
+    def generate_cars(self, users: list[PydanticObjectId]):
+        for user_id in users:
+            for _ in range(self.rng.choice([1, 1, 1, 2, 2, 3])):
+                car_id = PydanticObjectId()
+                self.cars[user_id].append(car_id)
+                yield {
+                    "_id": car_id,
+                    "user_id": user_id,
+                    "license_plate": f"SC{self.rng.randrange(10**6):06d}",
+                }
+
+    def generate_locations(self, count: int):
+        for _ in range(count):
+            location_id = PydanticObjectId()
+            owner_id = self.users[skewed_index(self.rng, len(self.users), 2)]
+            lat, lng = city_point(self.rng)
+            self.locations.append(location_id)
+            self.coordinates[location_id] = (lng, lat)
+            self.owners[location_id] = owner_id
+            yield {
+                "_id": location_id,
+                "owner_user_id": owner_id,
+                "location_name": f"Spot {len(self.locations)}",
+                "geo_point": {"type": "Point", "coordinates": [lng, lat]},
+                "latitude": lat,
+                "longitude": lng,
+                "fee_classification": "free",
+                "max_stay": self.rng.choice(MAX_STAYS),
+                "no_return_time": None,
+                "is_public": self.rng.random() < PUBLIC_SHARE,
+                "is_active": self.rng.random() >= INACTIVE_SHARE,
+            }
+
+    def generate_memberships(
+        self, locations: list[PydanticObjectId], users: list[PydanticObjectId]
+    ):
+        # Creating a location also saves it for its owner
+        for location_id in locations:
+            membership = self.save(self.owners[location_id], location_id)
+            if membership:
+                yield membership
+        # New users save spots, popular ones more often
+        for user_id in users:
+            for _ in range(membership_count(self.rng, cap=500)):
+                location_id = self.locations[
+                    skewed_index(self.rng, len(self.locations), 1.5)
+                ]
+                membership = self.save(user_id, location_id)
+                if membership:
+                    yield membership
+
+    def generate_sessions(self, count: int):
+        for _ in range(count):
+            # Heavy users park far more often than the long tail
+            user_id = self.users[skewed_index(self.rng, len(self.users), 3)]
+            saved = self.saved.get(user_id)
+            if self.rng.random() < MANUAL_SESSION_SHARE or not saved:
+                location_id = None
+                lat, lng = city_point(self.rng)
+            else:
+                location_id = self.rng.choice(saved)
+                lng, lat = self.coordinates[location_id]
+
+            started = self.now - timedelta(
+                seconds=self.rng.randrange(HISTORY_DAYS * 24 * 3600)
+            )
+            ends = started + timedelta(minutes=self.rng.choice([30, 60, 120, 240]))
+            active = ends > self.now
+            yield {
+                "user_id": user_id,
+                "parking_location_id": location_id,
+                "car_id": self.rng.choice(self.cars[user_id]),
+                "start_time": started,
+                "car_location": {"type": "Point", "coordinates": [lng, lat]},
+                "end_time": ends,
+                "actual_end_time": None if active else ends,
+                "status": "active" if active else "completed",
+                "created_at": started,
+            }
+
+    async def grow(self, users: int, locations: int, sessions: int) -> dict:
+        """Inserts whatever is missing to reach the given totals."""
+        timings = {}
+
+        started = time.perf_counter()
+        first_new = len(self.users)
+        await self.insert("user", self.generate_users(max(0, users - len(self.users))))
+        new_users = self.users[first_new:]
+        await self.insert("car", self.generate_cars(new_users))
+        timings["users"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        first_new = len(self.locations)
+        await self.insert(
+            "parking_location",
+            self.generate_locations(max(0, locations - len(self.locations))),
+        )
+        new_locations = self.locations[first_new:]
+        timings["locations"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.memberships += await self.insert(
+            "user_parking_location",
+            self.generate_memberships(new_locations, new_users),
+        )
+        timings["memberships"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.sessions += await self.insert(
+            "parking_session", self.generate_sessions(max(0, sessions - self.sessions))
+        )
+        timings["sessions"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        # Same indexes as production; cheaper to build once the data is in
+        await init_beanie(database=self.db, document_models=DOCUMENT_MODELS)
+        timings["indexes"] = time.perf_counter() - started
+        return timings
+
+    @property
+    def counts(self) -> dict:
+        return {
+            "users": len(self.users),
+            "locations": len(self.locations),
+            "memberships": self.memberships,
+            "sessions": self.sessions,
+        }
+
+
+async def main(args):
+    client = motor.motor_asyncio.AsyncIOMotorClient(
+        config.DATABASE_URL, uuidRepresentation="standard"
+    )
+    db = client[args.database]
+    if args.drop:
+        await client.drop_database(args.database)
+
+    generator = DatasetGenerator(db, args.seed, args.batch_size, args.in_flight)
+    started = time.perf_counter()
+    timings = await generator.grow(args.users, args.locations, args.sessions)
+    elapsed = time.perf_counter() - started
+
+    print(f"Loaded {generator.counts} into {args.database} in {elapsed:.0f}s")
+    print(", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", default="parkomat_scale")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--locations", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--in-flight", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--drop", action="store_true", help="start from an empty database")
+    args = parser.parse_args()
+    asyncio.run(main(args))
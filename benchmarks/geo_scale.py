@@ -0,0 +1,198 @@
+"""
+How the production query pipelines scale: grows a synthetic dataset (see
+benchmarks.generate_dataset) through several sizes and, at each size, runs
+
+    proximity_saved   get_saved_location_ids + the "saved" $geoNear
+    proximity_public  the public candidate $geoNear behind the proximity cache
+    saved_locations   the user_parking_location $lookup of GET /parking
+    session_history   the first page of GET /session
+    session_active    the same, filtered to active sessions
+
+for heavy users (the top of the skewed distribution) and typical ones.
+Each query reports p50/p95 latency plus its explain("executionStats"):
+keys and documents examined, and documents examined per document returned.
+
+Needs a local mongod; everything happens in a throwaway database.
+
+    DATABASE_URL=mongodb://localhost:27017/ \\
+        python -m benchmarks.geo_scale --sizes 10000 100000 1000000 \\
+            --output geo_scale.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+import motor.motor_asyncio
+
+from api.private.parking_location import (
+    get_proximity_pipeline,
+    get_saved_location_ids,
+    saved_locations_pipeline,
+)
+from api.private.parking_session import SESSION_LIST_FIELDS, session_read_pipeline
+from app.core.config import config
+from benchmarks._common import git_commit, percentile
+from benchmarks.generate_dataset import CITIES, DatasetGenerator, city_point
+
+HEAVY_USERS = 5
+
+
+def sum_field(value, field: str) -> int:
+    """Adds up `field` across the whole explain output, shards and $lookups included."""
+    if isinstance(value, dict):
+        return sum(
+            item if key == field and isinstance(item, int) else sum_field(item, field)
+            for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return sum(sum_field(item, field) for item in value)
+    return 0
+
+
+async def explain(db, collection: str, pipeline: list[dict], returned: int) -> dict:
+    plan = await db.command(
+        {
+            "explain": {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+            "verbosity": "executionStats",
+        }
+    )
+    docs = sum_field(plan, "totalDocsExamined")
+    keys = sum_field(plan, "totalKeysExamined")
+    return {
+        "returned": returned,
+        "keys_examined": keys,
+        "docs_examined": docs,
+        "docs_examined_per_returned": round(docs / max(returned, 1), 1),
+    }
+
+
+def build_queries() -> dict:
+    """Each query builds its pipeline from the production helpers for one user."""
+
+    async def proximity_saved(user_id, lat, lng):
+        location_ids = await get_saved_location_ids(user_id)
+        pipeline = await get_proximity_pipeline(
+            user_id, lat, lng, "saved", location_ids=location_ids
+        )
+        return "parking_location", pipeline
+
+    async def proximity_public(user_id, lat, lng):
+        pipeline = await get_proximity_pipeline(
+            None, lat, lng, "public", limit=config.PROXIMITY_CACHE_CANDIDATES
+        )
+        return "parking_location", pipeline
+
+    async def saved_locations(user_id, lat, lng):
+        return "user_parking_location", saved_locations_pipeline(user_id)
+
+    async def session_history(user_id, lat, lng):
+        pipeline = session_read_pipeline(
+            {"user_id": user_id}, SESSION_LIST_FIELDS, config.SESSION_PAGE_SIZE + 1
+        )
+        return "parking_session", pipeline
+
+    async def session_active(user_id, lat, lng):
+        pipeline = session_read_pipeline(
+            {"user_id": user_id, "status": "active"},
+            SESSION_LIST_FIELDS,
+            config.SESSION_PAGE_SIZE + 1,
+        )
+        return "parking_session", pipeline
+
+    return {
+        "proximity_saved": proximity_saved,
+        "proximity_public": proximity_public,
+        "saved_locations": saved_locations,
+        "session_history": session_history,
+        "session_active": session_active,
+    }
+
+
+async def run_query(db, query, users: list, runs: int, rng: random.Random) -> dict:
+    latencies = []
+    for i in range(runs):
+        lat, lng = city_point(rng)
+        started = time.perf_counter()
+        collection, pipeline = await query(users[i % len(users)], lat, lng)
+        await db[collection].aggregate(pipeline).to_list(length=None)
+        latencies.append(time.perf_counter() - started)
+
+    # The plan of the first user is representative: same pipeline shape
+    lat, lng = CITIES[0][:2]
+    collection, pipeline = await query(users[0], lat, lng)
+    returned = len(await db[collection].aggregate(pipeline).to_list(length=None))
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        **await explain(db, collection, pipeline, returned),
+    }
+
+
+async def main(args):
+    client = motor.motor_asyncio.AsyncIOMotorClient(
+        config.DATABASE_URL, uuidRepresentation="standard"
+    )
+    db = client[args.database]
+    await client.drop_database(args.database)
+
+    generator = DatasetGenerator(db, args.seed, args.batch_size)
+    queries = build_queries()
+    rng = random.Random(args.seed)
+    results = []
+
+    for size in args.sizes:
+        users = max(HEAVY_USERS * 2, int(size * args.users_per_location))
+        sessions = int(size * args.sessions_per_location)
+        print(f"Growing to {size} locations, {users} users, {sessions} sessions...")
+        load = await generator.grow(users, size, sessions)
+
+        # Low indices are the heavy users of the skewed distributions
+        heavy = generator.users[:HEAVY_USERS]
+        typical = rng.sample(generator.users[HEAVY_USERS:], HEAVY_USERS)
+
+        row = {"size": size, "counts": generator.counts, "load_seconds": load, "queries": {}}
+        for name, query in queries.items():
+            for cohort, cohort_users in (("heavy", heavy), ("typical", typical)):
+                result = await run_query(db, query, cohort_users, args.runs, rng)
+                row["queries"][f"{name}:{cohort}"] = result
+                print(
+                    f"{size:>10} {name:>17} {cohort:>7}: "
+                    f"p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                    f"docs/returned {result['docs_examined_per_returned']:>8}  "
+                    f"({result['docs_examined']} docs, {result['keys_examined']} keys)"
+                )
+        results.append(row)
+
+    if not args.keep:
+        await client.drop_database(args.database)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "runs": args.runs,
+        "results": results,
+    }
+    output = os.path.abspath(args.output)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users-per-location", type=float, default=0.1)
+    parser.add_argument("--sessions-per-location", type=float, default=10)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", default="parkomat_geo_scale")
+    parser.add_argument("--keep", action="store_true", help="keep the database afterwards")
+    parser.add_argument("--output", default="geo_scale.json")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,142 @@
+"""
+Latency of the "saved" proximity search as the parking_location table grows,
+comparing the previous pipeline ($geoNear over every active location, then a
+$lookup into user_parking_location) with the membership-driven one used by
+GET /parking/proximity.
+
+Needs a local mongod; everything happens in a throwaway database.
+
+    DATABASE_URL=mongodb://localhost:27017/ \\
+        python -m benchmarks.proximity_saved --sizes 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import motor.motor_asyncio
+from beanie import PydanticObjectId, init_beanie
+
+from api.private.parking_location import get_proximity_pipeline, get_saved_location_ids
+from app.core.config import config
+from models.models import ParkingLocation, UserParkingLocation
+
+CITIES = [
+    (51.5074, -0.1278),
+    (48.8566, 2.3522),
+    (52.5200, 13.4050),
+    (50.4501, 30.5234),
+    (40.4168, -3.7038),
+    (41.9028, 12.4964),
+]
+QUERY_POINT = CITIES[0]
+SAVED_PER_USER = 20
+RUNS = 30
+
+
+def old_saved_pipeline(user_id: PydanticObjectId, lat: float, lng: float) -> list:
+    return [
+        {
+            "$geoNear": {
+                "near": {"type": "Point", "coordinates": [lng, lat]},
+                "distanceField": "distance_meters",
+                "spherical": True,
+                "query": {"is_active": True},
+            }
+        },
+        {
+            "$lookup": {
+                "from": "user_parking_location",
+                "localField": "_id",
+                "foreignField": "parking_location_id",
+                "as": "membership",
+            }
+        },
+        {"$match": {"membership.user_id": user_id}},
+    ]
+
+
+async def load_dataset(db, size: int) -> PydanticObjectId:
+    await db.parking_location.delete_many({})
+    await db.user_parking_location.delete_many({})
+
+    locations, memberships = [], []
+    for i in range(size):
+        lat, lng = random.choice(CITIES)
+        lat += random.gauss(0, 0.05)
+        lng += random.gauss(0, 0.05)
+        location_id = PydanticObjectId()
+        owner_id = PydanticObjectId()
+        locations.append(
+            {
+                "_id": location_id,
+                "owner_user_id": owner_id,
+                "location_name": f"Spot {i}",
+                "geo_point": {"type": "Point", "coordinates": [lng, lat]},
+                "latitude": lat,
+                "longitude": lng,
+                "is_public": random.random() < 0.3,
+                "is_active": True,
+            }
+        )
+        memberships.append({"user_id": owner_id, "parking_location_id": location_id})
+
+    # The benchmarked user saved a handful of spots around the query point
+    user_id = PydanticObjectId()
+    for location in random.sample(locations, min(SAVED_PER_USER, size)):
+        memberships.append({"user_id": user_id, "parking_location_id": location["_id"]})
+
+    for start in range(0, size, 10_000):
+        await db.parking_location.insert_many(
+            locations[start : start + 10_000], ordered=False
+        )
+    for start in range(0, len(memberships), 10_000):
+        await db.user_parking_location.insert_many(
+            memberships[start : start + 10_000], ordered=False
+        )
+
+    return user_id
+
+
+async def measure(run) -> float:
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+async def main(sizes: list[int]):
+    client = motor.motor_asyncio.AsyncIOMotorClient(config.DATABASE_URL)
+    db = client["parkomat_benchmark"]
+    await init_beanie(database=db, document_models=[ParkingLocation, UserParkingLocation])
+    collection = ParkingLocation.get_pymongo_collection()
+    lat, lng = QUERY_POINT
+
+    print(f"{'locations':>10} {'before (ms)':>12} {'after (ms)':>11}")
+    for size in sizes:
+        user_id = await load_dataset(db, size)
+
+        async def before():
+            pipeline = old_saved_pipeline(user_id, lat, lng)
+            await collection.aggregate(pipeline).to_list(length=10)
+
+        async def after():
+            location_ids = await get_saved_location_ids(user_id)
+            pipeline = await get_proximity_pipeline(
+                user_id, lat, lng, "saved", location_ids=location_ids
+            )
+            await collection.aggregate(pipeline).to_list(length=None)
+
+        print(f"{size:>10} {await measure(before):>12.1f} {await measure(after):>11.1f}")
+
+    await client.drop_database("parkomat_benchmark")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    asyncio.run(main(parser.parse_args().sizes))
@@ -0,0 +1,86 @@
+"""
+Signin latency under concurrent load, with Argon2 verified inline on the
+event loop (previous behaviour) and through app.core.password_utils.
+
+Each simulated signin verifies one password. A probe coroutine measures
+how long a trivial request (e.g. /health) waits for the loop meanwhile.
+
+    python -m benchmarks.signin_latency --concurrency 32 --signins 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core.password_utils import password_hasher, pwd_context, verify_password
+from benchmarks._common import percentile
+
+PASSWORD = "correct horse battery"
+
+
+async def signin_inline(hashed: str):
+    verify_password(PASSWORD, hashed)
+
+
+async def signin_pooled(hashed: str):
+    await password_hasher.verify(PASSWORD, hashed)
+
+
+async def probe(latencies: list[float], done: asyncio.Event):
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        latencies.append(time.perf_counter() - started - 0.01)
+
+
+async def run(signin, hashed: str, concurrency: int, signins: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, probe_latencies = [], []
+    done = asyncio.Event()
+
+    async def one():
+        # Timed from arrival, so time spent queued behind other signins counts
+        started = time.perf_counter()
+        async with semaphore:
+            await signin(hashed)
+        latencies.append(time.perf_counter() - started)
+
+    probe_task = asyncio.create_task(probe(probe_latencies, done))
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(signins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    return {
+        "signin/s": signins / elapsed,
+        "p50 ms": percentile(latencies, 50) * 1000,
+        "p99 ms": percentile(latencies, 99) * 1000,
+        "probe p50 ms": statistics.median(probe_latencies or [0]) * 1000,
+        "probe max ms": max(probe_latencies or [0]) * 1000,
+    }
+
+
+async def main(concurrency: int, signins: int):
+    hashed = pwd_context.hash(PASSWORD)
+    password_hasher.start()
+
+    for name, signin in [("inline", signin_inline), ("pooled", signin_pooled)]:
+        result = await run(signin, hashed, concurrency, signins)
+        print(f"{name:>7}: " + ", ".join(f"{k} {v:.1f}" for k, v in result.items()))
+
+    stats = password_hasher.stats
+    print(
+        f"pool queue time: avg {stats['queue_time_total'] / stats['completed'] * 1000:.1f}ms, "
+        f"max {stats['queue_time_max'] * 1000:.1f}ms"
+    )
+    password_hasher.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--signins", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.signins))
@@ -0,0 +1,74 @@
+"""
+Compares serving a car photo with the previous handler (os.path.exists +
+plain FileResponse) and the cached handler in api/static.py.
+
+Runs in-process through httpx's ASGI transport, so numbers reflect the
+application overhead, not the network.
+
+    python -m benchmarks.static_photos --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import FileResponse
+from PIL import Image
+
+from api.static import static_router
+
+FILENAME = "user-car.jpg"
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(static_router, prefix="/new")
+
+    @app.get("/old/static/cars/{filename}")
+    async def get_car_image_old(filename: str):
+        file_path = os.path.join("static/cars", filename)
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail="Image not found")
+        return FileResponse(file_path)
+
+    return app
+
+
+async def run(client: httpx.AsyncClient, url: str, requests: int, headers=None):
+    started = time.perf_counter()
+    transferred = 0
+    for _ in range(requests):
+        response = await client.get(url, headers=headers)
+        transferred += len(response.content)
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, transferred / requests, response.status_code
+
+
+async def main(requests: int):
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.makedirs("static/cars")
+    Image.new("RGB", (1600, 1200), "gray").save(f"static/cars/{FILENAME}", "JPEG")
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        etag = (await client.get(f"/new/static/cars/{FILENAME}")).headers["etag"]
+        scenarios = [
+            ("before: full download", f"/old/static/cars/{FILENAME}", None),
+            ("after: full download", f"/new/static/cars/{FILENAME}", None),
+            ("after: revalidation", f"/new/static/cars/{FILENAME}", {"If-None-Match": etag}),
+            ("after: range 0-1023", f"/new/static/cars/{FILENAME}", {"Range": "bytes=0-1023"}),
+        ]
+        for name, url, headers in scenarios:
+            rps, size, status = await run(client, url, requests, headers)
+            print(f"{name:24} {rps:8.0f} req/s  {size:8.0f} B/req  (HTTP {status})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().requests))
@@ -0,0 +1,97 @@
+"""
+Measures TelegramClient throughput against a local fake Telegram API.
+
+The fake API enforces Telegram-like limits (1 msg/s per chat, 30 msg/s overall)
+and answers 429 with `retry_after` when they are exceeded, so this also shows
+how often the client's token buckets let a request through too early.
+
+    python -m benchmarks.telegram_throughput --messages 300 --chats 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import defaultdict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+HOST, PORT = "127.0.0.1", 8765
+
+os.environ["TELEGRAM_API_URL"] = f"http://{HOST}:{PORT}"
+
+fake_telegram = FastAPI()
+sent_at: dict[str, list[float]] = defaultdict(list)
+received = {"ok": 0, "rate_limited": 0}
+
+
+@fake_telegram.post("/bot{token}/sendMessage")
+async def send_message(token: str, request: Request):
+    payload = await request.json()
+    now = time.monotonic()
+
+    chat_history = [t for t in sent_at[payload["chat_id"]] if now - t < 1]
+    global_count = sum(
+        1 for history in sent_at.values() for t in history if now - t < 1
+    )
+    if chat_history or global_count >= 30:
+        received["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests",
+                "parameters": {"retry_after": 1},
+            },
+        )
+
+    sent_at[payload["chat_id"]] = chat_history + [now]
+    received["ok"] += 1
+    return {"ok": True, "result": {"message_id": received["ok"]}}
+
+
+async def main(messages: int, chats: int):
+    from app.utils.telegram import send_telegram_msg, telegram
+
+    server = uvicorn.Server(
+        uvicorn.Config(fake_telegram, host=HOST, port=PORT, log_level="warning")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    await telegram.start()
+    latencies = []
+
+    async def send(i: int):
+        started = time.perf_counter()
+        await send_telegram_msg(str(i % chats), f"message {i}")
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    elapsed = time.perf_counter() - started
+
+    await telegram.stop()
+    server.should_exit = True
+    await server_task
+
+    latencies.sort()
+    print(f"messages:     {messages} to {chats} chats in {elapsed:.2f}s")
+    print(f"throughput:   {messages / elapsed:.1f} msg/s")
+    print(f"latency p50:  {statistics.median(latencies) * 1000:.0f} ms")
+    print(f"latency p99:  {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms")
+    print(f"429 answered: {received['rate_limited']}")
+    print(f"client stats: {telegram.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.chats))
@@ -0,0 +1,157 @@
+"""
+Peak memory of concurrent photo uploads: the previous handler code
+(await photo.read(), then a BytesIO copy for Pillow) against handing the
+spooled upload file straight to the image workers, as the handlers do now.
+
+Uploads are multipart POSTs through httpx's in-process ASGI transport (as
+in benchmarks.api_suite) to a two-route app behind the production
+UploadLimitMiddleware, so Starlette's multipart parser spools each photo
+to disk past 1 MB just like in the API. Each variant runs in a fresh
+subprocess so ru_maxrss is its own peak; the report is that peak above
+the RSS before the burst.
+
+    python -m benchmarks.upload_memory --uploads 8 --size-mb 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+from PIL import Image
+
+from app.core.config import config
+from app.utils.images import image_processor, sniff_image
+from app.utils.uploads import UploadLimitMiddleware
+
+# Random noise compresses badly: roughly 1.2 bytes per pixel at quality 95
+BYTES_PER_PIXEL = 1.2
+
+
+def make_photo(path: str, size_mb: int):
+    pixels = int(size_mb * 1024 * 1024 / BYTES_PER_PIXEL)
+    width = int((pixels * 4 / 3) ** 0.5)
+    height = pixels // width
+    noise = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    noise.save(path, "JPEG", quality=95)
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_app(workdir: str) -> FastAPI:
+    app = FastAPI()
+
+    def output() -> str:
+        return os.path.join(workdir, f"{uuid.uuid4().hex}.jpg")
+
+    @app.post("/read")
+    async def read(photo: UploadFile = File(...)):
+        await image_processor.save_as_jpeg(await photo.read(), output())
+        return {"ok": True}
+
+    @app.post("/stream")
+    async def stream(photo: UploadFile = File(...)):
+        sniff_image(photo.file)
+        await image_processor.save_as_jpeg(photo.file, output())
+        return {"ok": True}
+
+    return UploadLimitMiddleware(app)
+
+
+async def upload(client: httpx.AsyncClient, variant: str, photo: str):
+    # A file object is streamed by httpx instead of being copied into memory
+    with open(photo, "rb") as f:
+        response = await client.post(
+            f"/{variant}", files={"photo": ("upload.jpg", f, "image/jpeg")}
+        )
+    response.raise_for_status()
+
+
+async def run_variant(variant: str, photo: str, uploads: int) -> dict:
+    app = build_app(tempfile.mkdtemp(prefix="parkomat-uploads-"))
+    image_processor.start()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        baseline = current_rss_mb()
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(client, variant, photo) for _ in range(uploads)))
+        elapsed = time.perf_counter() - started
+    image_processor.stop()
+
+    return {
+        "variant": variant,
+        "baseline_mb": round(baseline, 1),
+        "peak_above_baseline_mb": round(peak_rss_mb() - baseline, 1),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def spawn(variant: str, photo: str, uploads: int) -> dict:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.upload_memory",
+            "--variant",
+            variant,
+            "--photo",
+            photo,
+            "--uploads",
+            str(uploads),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    photo = os.path.join(tempfile.mkdtemp(prefix="parkomat-photo-"), "upload.jpg")
+    make_photo(photo, args.size_mb)
+    size = os.path.getsize(photo)
+    print(f"{args.uploads} concurrent uploads of a {size / 1024 / 1024:.1f} MB JPEG")
+    if size > config.UPLOAD_MAX_BYTES:
+        print(f"Larger than UPLOAD_MAX_BYTES ({config.UPLOAD_MAX_BYTES} bytes), would be a 413")
+        return
+
+    for variant, label in (("read", "photo.read() + BytesIO"), ("stream", "spooled file")):
+        result = spawn(variant, photo, args.uploads)
+        print(
+            f"{label:>24}: peak +{result['peak_above_baseline_mb']:7.1f} MB RSS  "
+            f"({result['seconds']:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--variant", choices=["read", "stream"])
+    parser.add_argument("--photo")
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(asyncio.run(run_variant(args.variant, args.photo, args.uploads))))
+    else:
+        main(args)
@@ -4,8 +4,22 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from beanie import Document, PydanticObjectId
+from beanie import (
+    Delete,
+    Document,
+    Insert,
+    PydanticObjectId,
+    Replace,
+    Save,
+    SaveChanges,
+    Update,
+    after_event,
+)
 from pydantic import BaseModel, Field
+from pymongo import IndexModel
+
+from app.utils.proximity_cache import proximity_cache
+from app.utils.user_cache import user_cache
 
 
 class User(Document):
@@ -21,6 +35,16 @@ class User(Document):
 
     class Settings:
         name = "user"
+        indexes = [
+            # Signin, signup and password reset look users up by email
+            IndexModel([("email", 1)], unique=True),
+            # Telegram webhook
+            "connection_code",
+        ]
+
+    @after_event(Save, Replace, Update, SaveChanges, Delete)
+    async def invalidate_cache(self):
+        await user_cache.invalidate(str(self.id))
 
 
 class NotificationSettings(BaseModel):
@@ -31,6 +55,8 @@ class NotificationSettings(BaseModel):
 class OTPActivationModel(Document):
     class Settings:
         name = "otp_activation"
+        # Expired activations are removed by MongoDB
+        indexes = [IndexModel([("expires_at", 1)], expireAfterSeconds=0)]
 
     user_id: PydanticObjectId
     otp: str
@@ -41,9 +67,9 @@ class PasswordResetToken(Document):
     class Settings:
         name = "password_reset_token"
         indexes = [
-            "token",
+            IndexModel([("token", 1)], unique=True),
             "user_id",
-            "expires_at",
+            IndexModel([("expires_at", 1)], expireAfterSeconds=0),
         ]
 
     user_id: PydanticObjectId
@@ -59,6 +85,8 @@ class Car(Document):
 
     class Settings:
         name = "car"
+        # One plate per garage; also serves listing a user's cars
+        indexes = [IndexModel([("user_id", 1), ("license_plate", 1)], unique=True)]
 
 
 class FeeClassification(Enum):
@@ -83,6 +111,18 @@ class ParkingLocation(Document):
     class Settings:
         name = "parking_location"
         indexes = [[("geo_point", "2dsphere")]]
+        # Lets the cache hook tell whether a spot was public before the write
+        use_state_management = True
+        state_management_save_previous = True
+
+    @after_event(Insert, Save, Replace, Update, SaveChanges, Delete)
+    async def invalidate_proximity_cache(self):
+        # Public before or after the write, so spots made private drop out too.
+        # Depending on the operation Beanie has already moved the pre-write
+        # state to the previous slot when this runs, so both are checked.
+        states = (self._saved_state, self._previous_saved_state)
+        if self.is_public or any(state and state.get("is_public") for state in states):
+            await proximity_cache.invalidate()
 
 
 class UserParkingLocation(Document):
@@ -91,6 +131,10 @@ class UserParkingLocation(Document):
 
     class Settings:
         name = "user_parking_location"
+        # Covers the membership lookup done before the "saved" proximity search
+        indexes = [
+            IndexModel([("user_id", 1), ("parking_location_id", 1)], unique=True)
+        ]
 
 
 class ParkingSessionStatus(Enum):
@@ -117,4 +161,56 @@ class ParkingSession(Document):
 
     class Settings:
         name = "parking_session"
-        indexes = [[("car_location", "2dsphere")]]
+        indexes = [
+            [("car_location", "2dsphere")],
+            # Keyset pagination of GET /session, with and without a status filter
+            [("user_id", 1), ("start_time", -1), ("_id", -1)],
+            [("user_id", 1), ("status", 1), ("start_time", -1), ("_id", -1)],
+            # Reminder recovery on startup only ever looks at active sessions
+            IndexModel(
+                [("status", 1)],
+                partialFilterExpression={"status": ParkingSessionStatus.ACTIVE.value},
+            ),
+        ]
+
+
+class SessionEventType(Enum):
+    STARTED = "started"
+    COMPLETED = "completed"
+    EXPIRED = "expired"
+    CANCELLED = "cancelled"
+
+
+class SessionEventStatus(Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class SessionEvent(Document):
+    """Outbox entry written with a session's state change, dispatched later."""
+
+    session_id: PydanticObjectId
+    user_id: PydanticObjectId
+    type: SessionEventType
+    status: SessionEventStatus = SessionEventStatus.PENDING
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    locked_until: Optional[datetime] = None
+    # Set by the dispatcher that claimed the event
+    lease_id: Optional[str] = None
+    last_error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
+
+    class Settings:
+        name = "session_event"
+        indexes = [
+            # The dispatcher's claim: due pending events and expired leases
+            [("status", 1), ("next_attempt_at", 1)],
+            [("status", 1), ("locked_until", 1)],
+            # Handled events are kept a week for debugging
+            IndexModel([("processed_at", 1)], expireAfterSeconds=7 * 86400),
+        ]
@@ -0,0 +1,64 @@
+"""
+One-off migration for the indexes declared in models/models.py that the
+app found blocked on startup ("Indexes were not built"). Without --apply it
+only reports. With --apply, under a lock so only one run can go at a time:
+- duplicates in the way of a unique index are merged: references are
+  repointed to the survivor (for users the verified account, otherwise the
+  oldest document), the others are copied to <collection>_merged and deleted
+- indexes whose options changed are dropped
+then the declared indexes are built. Every merge and drop is printed.
+
+    python -m scripts.migrate_indexes            # report only
+    python -m scripts.migrate_indexes --apply
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from beanie import init_beanie
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import config
+from app.core.database import db
+from app.core.indexes import report_index_conflicts, resolve_index_conflicts
+from app.main import DOCUMENT_MODELS
+
+LOCK_COLLECTION = "migration_lock"
+LOCK_ID = "indexes"
+
+
+async def main(apply: bool):
+    if not await report_index_conflicts(db, DOCUMENT_MODELS):
+        print("Nothing to migrate")
+        return
+    if not apply:
+        print("Dry run, pass --apply to merge and rebuild")
+        return
+
+    locks = db[LOCK_COLLECTION]
+    try:
+        await locks.insert_one({"_id": LOCK_ID, "started_at": datetime.now(timezone.utc)})
+    except DuplicateKeyError:
+        print(f"Another migration holds the lock ({LOCK_COLLECTION}.{LOCK_ID}), not running")
+        return
+
+    try:
+        await resolve_index_conflicts(db, DOCUMENT_MODELS)
+        await init_beanie(
+            database=db,
+            document_models=DOCUMENT_MODELS,
+            allow_index_dropping=config.MONGO_DROP_UNDECLARED_INDEXES,
+        )
+        print("Declared indexes built")
+    finally:
+        await locks.delete_one({"_id": LOCK_ID})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--apply", action="store_true", help="merge and rebuild (default: report only)"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.apply))
@@ -0,0 +1,34 @@
+"""
+Settings every test needs before app modules are imported (app.core.config
+reads them at import), and fixtures shared by the mongomock based tests.
+"""
+
+import os
+
+import pytest
+
+for name, value in {
+    "PROJECT_NAME": "parkomat-api",
+    "DATABASE_NAME": "parkomat_test",
+    "DATABASE_URL": os.getenv("TEST_DATABASE_URL", "mongodb://localhost:27017/"),
+    "TELEGRAM_BOT_TOKEN": "test",
+    "API_BASE_URL": "http://localhost:8000",
+    "JWT_SECRET_KEY": "test",
+    "PASSWORDS_SALT_SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def mongomock_compat(monkeypatch):
+    """Lets init_beanie run against mongomock_motor."""
+    database = pytest.importorskip("mongomock.database")
+    # mongomock doesn't accept the keyword arguments Beanie passes here
+    list_collection_names = database.Database.list_collection_names
+    monkeypatch.setattr(
+        database.Database,
+        "list_collection_names",
+        lambda self, filter=None, session=None, **kwargs: list_collection_names(
+            self, filter=filter, session=session
+        ),
+    )
@@ -0,0 +1,118 @@
+"""
+Idempotency-Key handling of IdempotentRoute against fakeredis: the first
+request runs, concurrent duplicates wait for it, later ones are replayed,
+and a key reused for a different body is refused.
+
+    pytest tests/test_idempotency.py
+"""
+
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+httpx = pytest.importorskip("httpx")
+
+from fastapi import APIRouter, FastAPI, File, Form, HTTPException, UploadFile  # noqa: E402
+
+from app.utils.idempotency import (  # noqa: E402
+    HEADER,
+    IdempotencyStore,
+    IdempotentRoute,
+    idempotent,
+)
+from app.utils.redis import manager  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    async def user_scope(request):
+        return "user-1"
+
+    monkeypatch.setattr(manager, "client", fakeredis.FakeAsyncRedis(decode_responses=True))
+    monkeypatch.setattr(IdempotencyStore, "user_scope", staticmethod(user_scope))
+
+
+def build_app(calls: list, delay: float = 0.0) -> FastAPI:
+    router = APIRouter(route_class=IdempotentRoute)
+
+    @router.post("/upload")
+    @idempotent
+    async def upload(plate: str = Form(...), photo: UploadFile = File(...)):
+        calls.append(plate)
+        await asyncio.sleep(delay)
+        if plate == "bad":
+            raise HTTPException(status_code=400, detail="Bad plate")
+        return {"plate": plate, "size": len(await photo.read()), "call": len(calls)}
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+async def post(app: FastAPI, key: str, plate: str = "AA1234BB", photo: bytes = b"jpeg"):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(
+            "/upload",
+            data={"plate": plate},
+            files={"photo": ("car.jpg", photo, "image/jpeg")},
+            headers={HEADER: key},
+        )
+
+
+def test_retry_is_replayed():
+    calls = []
+    app = build_app(calls)
+
+    async def scenario():
+        return await post(app, "key-1"), await post(app, "key-1")
+
+    first, retry = asyncio.run(scenario())
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json() == {"plate": "AA1234BB", "size": 4, "call": 1}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert calls == ["AA1234BB"]
+
+
+def test_concurrent_duplicate_waits_for_the_first():
+    calls = []
+    app = build_app(calls, delay=0.2)
+
+    async def scenario():
+        return await asyncio.gather(post(app, "key-1"), post(app, "key-1"))
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[0].json() == responses[1].json()
+    assert calls == ["AA1234BB"]
+
+
+def test_key_reused_for_a_different_body_is_refused():
+    calls = []
+    app = build_app(calls)
+
+    async def scenario():
+        return (
+            await post(app, "key-1"),
+            await post(app, "key-1", plate="XX0000XX"),
+            await post(app, "key-1", photo=b"other photo"),
+        )
+
+    first, other_field, other_photo = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert other_field.status_code == other_photo.status_code == 422
+    assert calls == ["AA1234BB"]
+
+
+def test_client_errors_are_not_remembered():
+    calls = []
+    app = build_app(calls)
+
+    async def scenario():
+        return await post(app, "key-1", plate="bad"), await post(app, "key-1", plate="bad")
+
+    first, retry = asyncio.run(scenario())
+    assert first.status_code == retry.status_code == 400
+    assert "Idempotent-Replayed" not in retry.headers
+    assert calls == ["bad", "bad"]
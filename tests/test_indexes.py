@@ -0,0 +1,156 @@
+"""
+Runs the query of every indexed endpoint through explain() against a local
+mongod, with the indexes declared in models/models.py, and fails if any of
+them needs a collection scan. Pipelines come from the endpoints' own
+builders, so the test follows them as they change.
+
+    TEST_DATABASE_URL=mongodb://localhost:27017/ pytest tests/test_indexes.py
+"""
+
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from api.private.parking_location import (
+    get_proximity_pipeline,
+    saved_locations_pipeline,
+)
+from api.private.parking_session import (
+    SESSION_LIST_FIELDS,
+    decode_session_cursor,
+    encode_session_cursor,
+    session_read_pipeline,
+)
+from app.core.config import config
+from app.main import DOCUMENT_MODELS
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL", "mongodb://localhost:27017/")
+DATABASE_NAME = "parkomat_index_test"
+
+
+def mongod_available() -> bool:
+    try:
+        MongoClient(DATABASE_URL, serverSelectionTimeoutMS=500).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not mongod_available(), reason="needs a local mongod")
+
+USER_ID = ObjectId()
+START_TIME = datetime(2026, 1, 1)
+LAT, LNG = 51.5074, -0.1278
+
+
+def session_list(match: dict) -> list[dict]:
+    return session_read_pipeline(match, SESSION_LIST_FIELDS, config.SESSION_PAGE_SIZE + 1)
+
+
+def next_page(match: dict) -> dict:
+    cursor = encode_session_cursor({"start_time": START_TIME, "_id": ObjectId()})
+    return {"$and": [match, decode_session_cursor(cursor)]}
+
+
+# name -> (collection, pipeline). Inline find() filters of the endpoints are
+# written as a $match; everything else is built by the endpoint's helper.
+QUERY_SHAPES = {
+    "signin: user by email": ("user", [{"$match": {"email": "driver@example.com"}}]),
+    "telegram webhook: user by code": (
+        "user",
+        [{"$match": {"connection_code": "CONNECT_X"}}],
+    ),
+    "create car: plate in garage": (
+        "car",
+        [{"$match": {"user_id": USER_ID, "license_plate": "AB12CDE"}}],
+    ),
+    "list cars": ("car", [{"$match": {"user_id": USER_ID}}]),
+    "session history": ("parking_session", session_list({"user_id": USER_ID})),
+    "session history by status": (
+        "parking_session",
+        session_list({"user_id": USER_ID, "status": "completed"}),
+    ),
+    "session history next page": (
+        "parking_session",
+        session_list(next_page({"user_id": USER_ID})),
+    ),
+    "reminder recovery": ("parking_session", [{"$match": {"status": "active"}}]),
+    "saved locations": ("user_parking_location", saved_locations_pipeline(USER_ID)),
+    "saved proximity": (
+        "parking_location",
+        asyncio.run(
+            get_proximity_pipeline(USER_ID, LAT, LNG, "saved", location_ids=[ObjectId()])
+        ),
+    ),
+    "public proximity candidates": (
+        "parking_location",
+        asyncio.run(
+            get_proximity_pipeline(
+                None, LAT, LNG, "public", limit=config.PROXIMITY_CACHE_CANDIDATES
+            )
+        ),
+    ),
+    "activation otp": (
+        "otp_activation",
+        [{"$match": {"_id": ObjectId(), "otp": "123456789"}}],
+    ),
+    "password reset token": ("password_reset_token", [{"$match": {"token": "token"}}]),
+}
+
+
+@pytest.fixture(scope="module")
+def database():
+    from beanie import init_beanie
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def create_indexes():
+        await init_beanie(
+            database=AsyncIOMotorClient(DATABASE_URL)[DATABASE_NAME],
+            document_models=DOCUMENT_MODELS,
+        )
+
+    asyncio.run(create_indexes())
+
+    client = MongoClient(DATABASE_URL)
+    yield client[DATABASE_NAME]
+    client.drop_database(DATABASE_NAME)
+    client.close()
+
+
+def winning_stages(explain):
+    """Every plan stage under a winningPlan, wherever the server nests it."""
+    if isinstance(explain, list):
+        for item in explain:
+            yield from winning_stages(item)
+    elif isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield from plan_stages(value)
+            else:
+                yield from winning_stages(value)
+
+
+def plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+@pytest.mark.parametrize("name", QUERY_SHAPES)
+def test_query_uses_an_index(database, name):
+    collection, pipeline = QUERY_SHAPES[name]
+
+    explain = database.command(
+        "explain",
+        {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        verbosity="queryPlanner",
+    )
+    assert "COLLSCAN" not in set(winning_stages(explain)), f"{name} scans {collection}"
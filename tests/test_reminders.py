@@ -0,0 +1,109 @@
+"""
+The reminder scheduler's lease: a delivery that fails stays claimed in the
+processing set and is requeued once its lease expires, never dropped.
+Runs against mongomock and fakeredis.
+
+    pytest tests/test_reminders.py
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from beanie import init_beanie  # noqa: E402
+
+from app.core.config import config  # noqa: E402
+from app.utils import reminders  # noqa: E402
+from app.utils.leases import CLAIM_SCRIPT, REQUEUE_SCRIPT  # noqa: E402
+from app.utils.redis import manager  # noqa: E402
+from app.utils.reminders import DUE_KEY, PROCESSING_KEY, ReminderScheduler  # noqa: E402
+from app.utils.telegram import TelegramError  # noqa: E402
+from models.models import (  # noqa: E402
+    Car,
+    ParkingLocation,
+    ParkingSession,
+    ParkingSessionStatus,
+    SessionEvent,
+    User,
+)
+
+DOCUMENT_MODELS = [User, Car, ParkingLocation, ParkingSession, SessionEvent]
+
+
+@pytest.fixture(autouse=True)
+def backends(monkeypatch, mongomock_compat):
+    monkeypatch.setattr(manager, "client", fakeredis.FakeAsyncRedis(decode_responses=True))
+
+
+async def new_scheduler() -> ReminderScheduler:
+    database = mongomock_motor.AsyncMongoMockClient()["parkomat_test"]
+    await init_beanie(database=database, document_models=DOCUMENT_MODELS)
+
+    scheduler = ReminderScheduler()
+    # What start() does, without the polling task
+    scheduler.claim = manager.client.register_script(CLAIM_SCRIPT)
+    scheduler.requeue = manager.client.register_script(REQUEUE_SCRIPT)
+    return scheduler
+
+
+async def active_session() -> ParkingSession:
+    user = await User(email="driver@example.com", password="x", telegram_chat_id="42").insert()
+    car = await Car(user_id=user.id, license_plate="AA1234BB").insert()
+    now = datetime.now(timezone.utc)
+    return await ParkingSession(
+        user_id=user.id,
+        car_id=car.id,
+        car_location={"type": "Point", "coordinates": [-0.1278, 51.5074]},
+        start_time=now,
+        end_time=now + timedelta(minutes=15),
+        status=ParkingSessionStatus.ACTIVE,
+    ).insert()
+
+
+def test_failed_delivery_is_requeued_after_its_lease(monkeypatch):
+    sent = []
+
+    async def full_queue(chat_id, text):
+        raise TelegramError("Telegram queue is full")
+
+    async def send(chat_id, text):
+        sent.append(chat_id)
+
+    async def scenario():
+        scheduler = await new_scheduler()
+        session = await active_session()
+        member = f"{session.id}:10:42"
+        await manager.client.zadd(DUE_KEY, {member: time.time() - 1})
+
+        monkeypatch.setattr(reminders, "send_telegram_msg", full_queue)
+        claimed = await scheduler.poll_once()
+        after_failure = (
+            await manager.client.zrange(DUE_KEY, 0, -1),
+            await manager.client.zrange(PROCESSING_KEY, 0, -1),
+        )
+
+        # Once the lease has expired, the next poll requeues and delivers it
+        later = time.time() + config.REMINDER_LEASE_SECONDS + 1
+        monkeypatch.setattr(
+            reminders, "time", SimpleNamespace(time=lambda: later, perf_counter=time.perf_counter)
+        )
+        monkeypatch.setattr(reminders, "send_telegram_msg", send)
+        await scheduler.poll_once()
+        after_retry = (
+            await manager.client.zrange(DUE_KEY, 0, -1),
+            await manager.client.zrange(PROCESSING_KEY, 0, -1),
+            await manager.client.sismember(f"session:reminders:{session.id}", 10),
+        )
+        return member, claimed, after_failure, after_retry
+
+    member, claimed, after_failure, after_retry = asyncio.run(scenario())
+    assert claimed == 1
+    assert after_failure == ([], [member])
+    assert after_retry == ([], [], True)
+    assert sent == ["42"]
@@ -0,0 +1,189 @@
+"""
+Session lifecycle writes and the session_event dispatcher against
+mongomock (a standalone mongod: no transactions) and fakeredis.
+
+    pytest tests/test_session_events.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from beanie import PydanticObjectId, init_beanie  # noqa: E402
+
+from app.utils import reminders, session_events  # noqa: E402
+from app.utils.loader import Loaders  # noqa: E402
+from app.utils.redis import manager  # noqa: E402
+from app.utils.session_events import event_dispatcher  # noqa: E402
+from app.utils.session_lifecycle import (  # noqa: E402
+    events_recorded,
+    start_session,
+    transition_session,
+)
+from models.models import (  # noqa: E402
+    Car,
+    ParkingLocation,
+    ParkingSession,
+    ParkingSessionStatus,
+    SessionEvent,
+    SessionEventStatus,
+    SessionEventType,
+    User,
+)
+
+DOCUMENT_MODELS = [User, Car, ParkingLocation, ParkingSession, SessionEvent]
+
+
+@pytest.fixture(autouse=True)
+def backends(monkeypatch, mongomock_compat):
+    monkeypatch.setattr(manager, "client", fakeredis.FakeAsyncRedis(decode_responses=True))
+
+    sent = []
+
+    async def send_telegram_msg(chat_id, text):
+        sent.append((chat_id, text))
+
+    monkeypatch.setattr(session_events, "send_telegram_msg", send_telegram_msg)
+    monkeypatch.setattr(reminders, "send_telegram_msg", send_telegram_msg)
+    return sent
+
+
+async def init_db():
+    database = mongomock_motor.AsyncMongoMockClient()["parkomat_test"]
+    await init_beanie(database=database, document_models=DOCUMENT_MODELS)
+
+
+async def new_session(minutes: int = 60, chat_id: str | None = "42") -> ParkingSession:
+    user = await User(email="driver@example.com", password="x", telegram_chat_id=chat_id).insert()
+    car = await Car(user_id=user.id, license_plate="AA1234BB").insert()
+    now = datetime.now(timezone.utc)
+    return ParkingSession(
+        id=PydanticObjectId(),
+        user_id=user.id,
+        car_id=car.id,
+        car_location={"type": "Point", "coordinates": [-0.1278, 51.5074]},
+        start_time=now,
+        end_time=now + timedelta(minutes=minutes),
+        status=ParkingSessionStatus.ACTIVE,
+    )
+
+
+def test_start_session_records_the_started_event():
+    async def scenario():
+        await init_db()
+        events_recorded.clear()
+        session = await new_session()
+        await start_session(session)
+        return session, await SessionEvent.find_all().to_list()
+
+    session, events = asyncio.run(scenario())
+    assert [event.type for event in events] == [SessionEventType.STARTED]
+    assert events[0].session_id == session.id
+    assert events_recorded.is_set()
+
+
+def test_start_session_without_its_event_leaves_no_session(monkeypatch):
+    async def failing_insert(self, *args, **kwargs):
+        raise RuntimeError("event insert failed")
+
+    async def scenario():
+        await init_db()
+        session = await new_session()
+        monkeypatch.setattr(SessionEvent, "insert", failing_insert)
+        with pytest.raises(RuntimeError):
+            await start_session(session)
+        return await ParkingSession.find_all().count()
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_transition_session_ends_a_session_once():
+    async def scenario():
+        await init_db()
+        session = await new_session()
+        await start_session(session)
+        ended_at = datetime.now(timezone.utc)
+        results = [
+            await transition_session(
+                session.id,
+                session.user_id,
+                status,
+                event_type,
+                ended_at=ended_at,
+            )
+            for status, event_type in (
+                (ParkingSessionStatus.COMPLETED, SessionEventType.COMPLETED),
+                (ParkingSessionStatus.CANCELLED, SessionEventType.CANCELLED),
+            )
+        ]
+        stored = await ParkingSession.get(session.id)
+        events = await SessionEvent.find_all().to_list()
+        return results, stored, events
+
+    results, stored, events = asyncio.run(scenario())
+    assert results == [True, False]
+    assert stored.status == ParkingSessionStatus.COMPLETED
+    assert [event.type for event in events] == [
+        SessionEventType.STARTED,
+        SessionEventType.COMPLETED,
+    ]
+
+
+def test_dispatcher_schedules_reminders_and_notifies(backends):
+    async def scenario():
+        await init_db()
+        session = await new_session()
+        await start_session(session)
+        claimed = await event_dispatcher.poll_once()
+        events = await SessionEvent.find_all().to_list()
+        due = await manager.client.zrange(reminders.DUE_KEY, 0, -1)
+        return session, claimed, events, due
+
+    session, claimed, events, due = asyncio.run(scenario())
+    assert claimed == 1
+    assert events[0].status == SessionEventStatus.DONE
+    assert due and all(member.startswith(f"{session.id}:") for member in due)
+    assert [chat_id for chat_id, _ in backends] == ["42"]
+    assert "has started" in backends[0][1]
+
+
+def test_last_reminder_expires_the_session():
+    async def scenario():
+        await init_db()
+        session = await new_session(minutes=0)
+        await start_session(session)
+        await reminders.deliver_reminder(str(session.id), 0, "42", Loaders())
+        stored = await ParkingSession.get(session.id)
+        events = await SessionEvent.find_all().to_list()
+        return stored, events
+
+    stored, events = asyncio.run(scenario())
+    assert stored.status == ParkingSessionStatus.COMPLETED
+    assert [event.type for event in events] == [
+        SessionEventType.STARTED,
+        SessionEventType.EXPIRED,
+    ]
+
+
+def test_sessions_of_users_without_telegram_still_expire(backends):
+    async def scenario():
+        await init_db()
+        session = await new_session(chat_id=None)
+        await start_session(session)
+        await event_dispatcher.poll_once()
+        due = await manager.client.zrange(reminders.DUE_KEY, 0, -1)
+
+        _, minutes_left, chat_id = due[0].split(":", 2)
+        await reminders.deliver_reminder(str(session.id), int(minutes_left), chat_id, Loaders())
+        await event_dispatcher.poll_once()
+        stored = await ParkingSession.get(session.id)
+        return session, due, stored
+
+    session, due, stored = asyncio.run(scenario())
+    assert due == [f"{session.id}:0:"]
+    assert stored.status == ParkingSessionStatus.COMPLETED
+    assert backends == []
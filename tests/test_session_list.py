@@ -0,0 +1,64 @@
+"""
+GET /session list items keep the shape they had before the list was
+projected: every field of a serialized ParkingSession, plus car and
+location. The baseline is the model itself, so a field added to
+ParkingSession but not to the list projection fails here.
+
+    pytest tests/test_session_list.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from beanie import PydanticObjectId, init_beanie  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from api.private.parking_session import (  # noqa: E402
+    SESSION_LIST_FIELDS,
+    serialize_session,
+    session_read_pipeline,
+)
+from models.models import ParkingSession  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def mongomock_beanie(mongomock_compat):
+    database = mongomock_motor.AsyncMongoMockClient()["parkomat_test"]
+    asyncio.run(init_beanie(database=database, document_models=[ParkingSession]))
+
+
+def stored_session() -> ParkingSession:
+    start = datetime(2026, 1, 1, 9)
+    return ParkingSession(
+        id=PydanticObjectId(),
+        user_id=PydanticObjectId(),
+        car_id=PydanticObjectId(),
+        parking_location_id=PydanticObjectId(),
+        start_time=start,
+        end_time=start + timedelta(hours=2),
+    )
+
+
+def test_list_items_keep_every_session_field():
+    session = stored_session()
+    # What the list returned when it served ParkingSession documents
+    baseline = set(jsonable_encoder(session))
+
+    document = session.model_dump(by_alias=True)
+    document["car"] = {"_id": session.car_id, "license_plate": "AA1234BB"}
+    item = serialize_session(document)
+
+    assert baseline <= set(item)
+    assert set(item) - baseline == {"car", "location"}
+    assert item["user_id"] == str(session.user_id)
+    assert item["created_at"] == session.created_at.isoformat()
+
+
+def test_list_projection_keeps_every_session_field():
+    pipeline = session_read_pipeline({}, SESSION_LIST_FIELDS, 10)
+    projection = next(stage["$project"] for stage in pipeline if "$project" in stage)
+    assert set(jsonable_encoder(stored_session())) <= set(projection)